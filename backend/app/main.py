@@ -1,55 +1,216 @@
 import os
+import json
+import hashlib
+import time
 import asyncio
+from functools import partial
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
-from app.models import ExplainRequest, ExplainResponse, ContextObject, StatsRequest, StatsObject, ChatRequest, ChatResponse
-from typing import List
-from app.services.rag import RAGService
-from app.services.integrations import IntegrationService
-from app.services.data_processing import process_slack_data, process_jira_data, process_confluence_data, process_notion_data
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 
+# Load .env before importing services, which read their tuning knobs at import time
 load_dotenv()
 
+from app.models import ExplainRequest, ExplainResponse, ContextCard, ChunkDetail, StatsRequest, StatsObject, ChatRequest, ChatResponse, DeleteDocumentsRequest
+from typing import List
+from app.services.rag import RAGService
+from app.services.integrations import IntegrationService
+from app.services.executors import get_executor, get_executor_stats, shutdown_executors
+from app.services.sync_state import SyncStateStore
+from app.services.data_processing import process_jira_data, process_confluence_data, process_notion_data, epoch_seconds
+from app.services.ingestion import ingest_slack_channel, split_jira_changes, jira_text_hash
+
 rag_service = None
 integration_service = None
+sync_state = None
 # Config hardcoded for now
 SLACK_CHANNEL_ID = "C0AECA17DM0"
 JIRA_JQL = "resolution = Unresolved ORDER BY created DESC"
 CONFLUENCE_CQL = 'type=page AND title ~ "Payment" ORDER BY lastmodified DESC'
 NOTION_QUERY = os.environ.get("NOTION_SEARCH_QUERY", "")
+# How far back the first sync reaches before any watermark exists
+SYNC_BACKFILL_DAYS = int(os.environ.get("SYNC_BACKFILL_DAYS", "30"))
+SYNC_STATE_PATH = os.environ.get(
+    "SYNC_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sync_state.json")
+)
+# Upper bound on ids per /context/chunks request
+MAX_CHUNK_IDS = 100
+# Background chunk summarization: chunks per LLM call, and how often to check the queue
+SUMMARY_BATCH_SIZE = int(os.environ.get("SUMMARY_BATCH_SIZE", "20"))
+SUMMARY_INTERVAL_SECONDS = float(os.environ.get("SUMMARY_INTERVAL_SECONDS", "30"))
+COMPACTION_INTERVAL_SECONDS = float(os.environ.get("COMPACTION_INTERVAL_SECONDS", "600"))
+
+def _sync_timeout(source: str) -> float:
+    """Per-source sync deadline, e.g. SYNC_TIMEOUT_NOTION=60, falling back to SYNC_TIMEOUT_SECONDS."""
+    default = os.environ.get("SYNC_TIMEOUT_SECONDS", "30")
+    return float(os.environ.get(f"SYNC_TIMEOUT_{source.upper()}", default))
+
+# Sync work per source that is still on the ingest pool, possibly past its deadline
+_running_syncs = {}
+
+def _log_late_sync(source: str, task: asyncio.Task):
+    if task.cancelled():
+        return
+    if task.exception():
+        print(f"Sync: {source} failed after its deadline: {task.exception()}")
+    else:
+        print(f"Sync: {source} finished after its deadline")
+
+async def run_source(source: str, work):
+    """Runs one source's blocking sync work on the ingest pool under its own deadline.
+
+    Connector clients are blocking, so fetch and ingest both happen on the pool.
+    On timeout the worker thread still finishes (and advances its watermark) in
+    the background; only this cycle's report is cut short. Until it does, later
+    cycles skip the source instead of starting a second sync from the same
+    watermark.
+    """
+    timeout = _sync_timeout(source)
+    result = {"timed_out": False}
+    running = _running_syncs.get(source)
+    if running is not None and not running.done():
+        print(f"Sync: {source} is still running from an earlier cycle, skipping")
+        result["still_running"] = True
+        return source, result
+
+    start = time.perf_counter()
+    task = asyncio.ensure_future(get_executor("ingest").run(work))
+    _running_syncs[source] = task
+    try:
+        # shield keeps the task (and so the in-flight marker) alive until the worker returns
+        result.update(await asyncio.wait_for(asyncio.shield(task), timeout=timeout))
+    except asyncio.TimeoutError:
+        print(f"Sync: {source} timed out after {timeout}s")
+        result["timed_out"] = True
+        task.add_done_callback(partial(_log_late_sync, source))
+    except Exception as e:
+        print(f"Sync: {source} failed: {e}")
+        result["error"] = str(e)
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return source, result
+
+def fetch_and_ingest(fetch, process, cursor_key: str, cursor_of, on_ingested=None) -> dict:
+    """Fetches one source and ingests it as soon as it arrives.
+
+    The source's watermark (cursor_of applied to each item, max wins) only
+    advances after its items were ingested, so a failed cycle is retried.
+    Items marked "failed" are not ingested and hold the watermark at the
+    oldest of them, so the next cycle fetches them again.
+    on_ingested(items) records any other per-item sync state at the same point.
+    """
+    start = time.perf_counter()
+    fetched = fetch() or []
+    items = [item for item in fetched if not item.get("failed")]
+    failed = [cursor_of(item) for item in fetched if item.get("failed")]
+    result = {"items": len(items), "fetch_ms": round((time.perf_counter() - start) * 1000, 1)}
+    if failed:
+        result["failed"] = len(failed)
+
+    docs = process(items) if items else []
+    result["documents"] = len(docs)
+    if docs:
+        result["chunks"] = rag_service.add_documents(docs)
+
+    cursors = [cursor_of(item) for item in items]
+    cursors = [c for c in cursors if c]
+    if failed:
+        # Watermarks are inclusive, so stopping at the oldest failure re-reads it next cycle
+        cursors = [min(c for c in failed if c)] if any(failed) else []
+    if cursors:
+        sync_state.set(cursor_key, max(cursors))
+    if on_ingested and items:
+        on_ingested(items)
+    return result
+
+def ingest_slack() -> dict:
+    """Streams new Slack messages (and their threads) into the store in batches.
+
+    Recently active threads under older parents are re-polled, so late replies
+    are picked up even though the parent is behind the watermark.
+    """
+    slack_key = f"slack:{SLACK_CHANNEL_ID}:oldest"
+    threads_key = f"slack:{SLACK_CHANNEL_ID}:threads"
+    cursor_key = f"slack:{SLACK_CHANNEL_ID}:thread_cursor"
+    oldest = sync_state.get(slack_key) or f"{time.time() - SYNC_BACKFILL_DAYS * 86400:.6f}"
+    result = ingest_slack_channel(integration_service, rag_service, SLACK_CHANNEL_ID, oldest=oldest,
+                                  active_threads=sync_state.get(threads_key, {}),
+                                  thread_cursor=sync_state.get(cursor_key))
+    if result["newest_ts"]:
+        sync_state.set(slack_key, result["newest_ts"])
+    threads = result.pop("threads")
+    sync_state.set(threads_key, threads)
+    sync_state.set(cursor_key, result.pop("thread_cursor"))
+    result["active_threads"] = len(threads)
+    return result
+
+def _tracked_jira(tickets):
+    """Tickets to sync: unresolved ones, plus resolved ones already ingested (so closures get patched)."""
+    known = sync_state.get("jira:issues", {})
+    return [t for t in tickets if t["key"] in known or not t.get("resolution")]
+
+def process_jira_changes(tickets):
+    """Re-chunks tickets whose text changed; status-only transitions are patched in place."""
+    changed, status_only = split_jira_changes(_tracked_jira(tickets), sync_state.get("jira:issues", {}))
+    for ticket in status_only:
+        patch = {"status": ticket["status"]}
+        if epoch_seconds(ticket.get("updated")) is not None:
+            patch["updated_at"] = epoch_seconds(ticket.get("updated"))
+        rag_service.update_document_metadata("jira", ticket["key"], patch)
+    print(f"Jira: {len(changed)} tickets with new text, {len(status_only)} status-only updates.")
+    return process_jira_data(changed)
+
+def _record_jira_issues(tickets):
+    """Remembers each ticket's text hash and status for the next change split."""
+    sync_state.merge("jira:issues", {t["key"]: {"text": jira_text_hash(t), "status": t["status"]} for t in _tracked_jira(tickets)})
+
+def _record_confluence_versions(pages):
+    """Remembers synced page versions so unchanged pages are skipped next time."""
+    sync_state.merge("confluence:versions", {page["id"]: page["version"] for page in pages})
 
 async def sync_data():
     """Fetches and ingests real-time data."""
     try:
         print("Syncing real-time data...")
-        if not integration_service or not rag_service:
+        if not integration_service or not rag_service or not sync_state:
             print("Services not ready, skipping sync.")
             return {"status": "skipped", "message": "Services not ready"}
 
-        # Fetch Data
-        slack_msgs = integration_service.fetch_channel_history(SLACK_CHANNEL_ID, limit=10)
-        jira_tickets = integration_service.search_jira_tickets(JIRA_JQL, limit=10)
-        confluence_pages = integration_service.search_confluence_pages(CONFLUENCE_CQL, limit=5)
-        notion_pages = integration_service.search_notion_pages(NOTION_QUERY, limit=5)
-        
-        # Process & Ingest
-        new_docs = []
-        if slack_msgs:
-            new_docs.extend(process_slack_data(slack_msgs, SLACK_CHANNEL_ID))
-        if jira_tickets:
-            new_docs.extend(process_jira_data(jira_tickets))
-        if confluence_pages:
-            new_docs.extend(process_confluence_data(confluence_pages))
-        if notion_pages:
-            new_docs.extend(process_notion_data(notion_pages))
-        
-        if new_docs:
-            rag_service.add_documents(new_docs)
-            print(f"Synced {len(new_docs)} items.")
-            return {"status": "success", "items_synced": len(new_docs)}
-        
-        return {"status": "success", "items_synced": 0}
+        # Each source only fetches what changed since its watermark.
+        # All sources are fetched concurrently; a slow or failing one doesn't hold up the rest
+        results = await asyncio.gather(
+            run_source("slack", ingest_slack),
+            run_source("jira", partial(
+                fetch_and_ingest,
+                partial(integration_service.search_jira_tickets_since, JIRA_JQL,
+                        updated_since=sync_state.get("jira:updated"), backfill_days=SYNC_BACKFILL_DAYS,
+                        include_resolved=True),
+                process_jira_changes,
+                "jira:updated", lambda ticket: ticket.get("updated"),
+                on_ingested=_record_jira_issues
+            )),
+            run_source("confluence", partial(
+                fetch_and_ingest,
+                partial(integration_service.search_confluence_pages_since, CONFLUENCE_CQL,
+                        modified_since=sync_state.get("confluence:lastmodified"), backfill_days=SYNC_BACKFILL_DAYS,
+                        known_versions=sync_state.get("confluence:versions", {})),
+                process_confluence_data,
+                "confluence:lastmodified", lambda page: page.get("last_modified"),
+                on_ingested=_record_confluence_versions
+            )),
+            run_source("notion", partial(
+                fetch_and_ingest,
+                partial(integration_service.search_notion_pages_since, NOTION_QUERY,
+                        edited_since=sync_state.get("notion:last_edited_time"), backfill_days=SYNC_BACKFILL_DAYS),
+                process_notion_data,
+                "notion:last_edited_time", lambda page: page.get("last_edited")
+            )),
+        )
+        sources = dict(results)
+        items_synced = sum(r.get("documents", 0) for r in sources.values())
+        print(f"Synced {items_synced} items.")
+        return {"status": "success", "items_synced": items_synced, "sources": sources}
         
     except Exception as e:
         print(f"Error in sync: {e}")
@@ -62,19 +223,56 @@ async def background_sync():
         await sync_data()
         await asyncio.sleep(60)
 
+async def background_summarize():
+    """Drains the chunk summary queue, then checks again every SUMMARY_INTERVAL_SECONDS."""
+    print("Starting background summarization loop...")
+    while True:
+        try:
+            summarized = 0
+            while True:
+                taken = await rag_service.summarize_pending(SUMMARY_BATCH_SIZE)
+                if not taken:
+                    break
+                summarized += taken
+            if summarized:
+                print(f"Summarized {summarized} chunks.")
+        except Exception as e:
+            print(f"Error in summarization: {e}")
+        await asyncio.sleep(SUMMARY_INTERVAL_SECONDS)
+
+async def background_compact():
+    """Purges superseded chunks from the side stores every COMPACTION_INTERVAL_SECONDS."""
+    print("Starting background compaction loop...")
+    while True:
+        await asyncio.sleep(COMPACTION_INTERVAL_SECONDS)
+        try:
+            report = await get_executor("ingest").run(rag_service.compact)
+            if report["vectors"]:
+                print(f"Compaction: reclaimed {report['vectors']} vectors (~{report['bytes']} bytes) "
+                      f"from {report['documents']} documents.")
+        except Exception as e:
+            print(f"Error in compaction: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global rag_service, integration_service
+    global rag_service, integration_service, sync_state
     rag_service = RAGService()
     integration_service = IntegrationService()
+    sync_state = SyncStateStore(SYNC_STATE_PATH)
     
-    # Start background task
-    task = asyncio.create_task(background_sync())
+    # Start background tasks
+    tasks = [
+        asyncio.create_task(background_sync()),
+        asyncio.create_task(background_summarize()),
+        asyncio.create_task(background_compact())
+    ]
     
     yield
     
     # Clean up
-    task.cancel()
+    for task in tasks:
+        task.cancel()
+    shutdown_executors()
 
 app = FastAPI(title="ContextSync Backend", lifespan=lifespan)
 
@@ -87,21 +285,77 @@ async def explain_code(request: ExplainRequest):
     if not rag_service:
         raise HTTPException(status_code=503, detail="RAG Service not initialized")
         
-    markdown_response = await rag_service.explain_code(
+    return await rag_service.explain_code(
         request.code_snippet, 
         request.file_path, 
-        request.line_numbers
+        request.line_numbers,
+        request.filters
     )
-    
-    return ExplainResponse(markdown=markdown_response)
 
-@app.post("/context/retrieve", response_model=List[ContextObject])  # POST http request
+def sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    """Streams (event, data) pairs as text/event-stream, reporting failures as an error event."""
+    async def body():
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            print(f"Error while streaming: {e}")
+            yield sse_event("error", {"message": str(e)})
+
+    # X-Accel-Buffering stops nginx-style proxies from holding tokens back
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/explain/stream")
+async def explain_code_stream(request: ExplainRequest):
+    """Streaming /explain: a context event, then tokens as they are generated, then done."""
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG Service not initialized")
+
+    return sse_response(rag_service.stream_explain(
+        request.code_snippet,
+        request.file_path,
+        request.line_numbers,
+        request.filters
+    ))
+
+@app.post("/context/retrieve", response_model=List[ContextCard], response_model_exclude_none=True)  # POST http request
 async def retrieve_context(request: ExplainRequest):
-    """Returns structured context objects for the IDE."""
+    """Returns compact context cards for the IDE; bodies come from /context/chunks."""
     if not rag_service:
         raise HTTPException(status_code=503, detail="RAG Service not initialized")
     
-    return await rag_service.get_context_objects(request.code_snippet)
+    return await rag_service.get_context_cards(request.code_snippet, request.filters)
+
+@app.get("/context/chunks", response_model=List[ChunkDetail])
+async def context_chunks(request: Request, ids: str, scope: str = "chunk"):
+    """Full bodies for comma-separated card IDs; scope=document returns whole parent documents.
+
+    Responses carry an ETag, and a matching If-None-Match gets an empty 304.
+    """
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG Service not initialized")
+    if scope not in ("chunk", "document"):
+        raise HTTPException(status_code=400, detail="scope must be 'chunk' or 'document'")
+    id_list = [doc_id for doc_id in ids.split(",") if doc_id]
+    if len(id_list) > MAX_CHUNK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CHUNK_IDS} ids per request")
+
+    details = await get_executor("retrieval").run(rag_service.get_chunks, id_list, scope)
+    body = json.dumps([detail.model_dump() for detail in details]).encode()
+    # Summaries and statuses can change under the same chunk ID, so the tag covers the body
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/context/ingest")
 async def ingest_webhook(request: Request):
@@ -116,13 +370,31 @@ async def manual_sync():
     """Manually triggers the data sync logic."""
     return await sync_data()
 
+@app.post("/context/compact")
+async def manual_compact():
+    """Manually purges superseded chunks and reports the reclaimed vectors and bytes."""
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG Service not initialized")
+    return await get_executor("ingest").run(rag_service.compact)
+
+@app.post("/context/documents/delete")
+async def delete_documents(request: DeleteDocumentsRequest):
+    """Removes deleted source documents (e.g. from a Jira or Confluence delete webhook).
+
+    Their chunks leave the vector store at once; compaction purges the side stores.
+    """
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG Service not initialized")
+    removed = await get_executor("ingest").run(rag_service.delete_documents, request.doc_keys)
+    return {"documents": len(request.doc_keys), "chunks_removed": removed}
+
 @app.post("/context/stats", response_model=List[StatsObject])
 async def context_stats(request: StatsRequest):
     """Returns context stats for a list of code snippets."""
     if not rag_service:
         raise HTTPException(status_code=503, detail="RAG Service not initialized")
     
-    stats_list = await rag_service.get_context_stats_batch(request.snippets)
+    stats_list = await rag_service.get_context_stats_batch(request.snippets, request.symbols, request.filters)
     return [StatsObject(**s) for s in stats_list]
 
 @app.post("/chat", response_model=ChatResponse)
@@ -138,3 +410,25 @@ async def chat_endpoint(request: ChatRequest):
     )
     
     return ChatResponse(reply=reply)
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming /chat: tokens as they are generated, then done."""
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG Service not initialized")
+
+    return sse_response(rag_service.stream_chat(
+        message=request.message,
+        history=request.history,
+        context=request.context
+    ))
+
+@app.get("/metrics")
+async def metrics():
+    """Cache and pipeline counters for checking hit rates and saturation."""
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG Service not initialized")
+
+    # get_metrics counts rows in the SQLite side stores, so keep it off the event loop
+    stats = await get_executor("retrieval").run(rag_service.get_metrics)
+    return {**stats, "executors": get_executor_stats()}
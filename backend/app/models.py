@@ -1,24 +1,55 @@
 from pydantic import BaseModel
 from typing import List, Optional
 
+class ContextFilters(BaseModel):
+    """Restricts retrieval to part of the store; applied inside the vector search, not afterwards."""
+    sources: Optional[List[str]] = None # e.g. ["jira"]
+    channel: Optional[str] = None # Slack channel ID
+    statuses: Optional[List[str]] = None # Jira statuses, exact match
+    open_only: bool = False # only Jira tickets that aren't done/closed/resolved
+    author: Optional[str] = None # Slack user or Jira creator
+    since: Optional[float] = None # epoch seconds, inclusive
+    until: Optional[float] = None
+
 class ExplainRequest(BaseModel):
     code_snippet: str
     file_path: str
     line_numbers: str
+    filters: Optional[ContextFilters] = None
 
 class ExplainResponse(BaseModel):
     markdown: str
+    cached: bool = False
+    # Prompt context size after packing, and how much packing cut from the raw chunks
+    context_tokens: Optional[int] = None
+    tokens_saved: Optional[int] = None
+
+class ContextCard(BaseModel):
+    """Compact retrieval hit; the full text is fetched on demand from /context/chunks."""
+    id: str # chunk ID (content hash)
+    source: str # "slack", "jira", "confluence" or "notion"
+    title: str
+    url: Optional[str] = None
+    score: float = 0.0
+    preview: str
 
-class ContextObject(BaseModel):
-    source: str # "slack" or "jira"
-    title_or_user: str
+class ChunkDetail(BaseModel):
+    id: str
+    source: str
+    title: str
     url: Optional[str] = None
-    content_summary: str
-    relevance_score: float = 0.0
-    related_code_files: List[str] = []
+    summary: Optional[str] = None
+    content: str
 
 class StatsRequest(BaseModel):
     snippets: List[str]
+    # Function/method names aligned with snippets; lets the server answer from the mention index
+    symbols: Optional[List[str]] = None
+    filters: Optional[ContextFilters] = None
+
+class DeleteDocumentsRequest(BaseModel):
+    # Source document keys, e.g. "jira:PAY-12", "confluence:9001", "slack:C123:1700000000.000100"
+    doc_keys: List[str]
 
 class StatsObject(BaseModel):
     slack_count: int
@@ -0,0 +1,192 @@
+# app/services/context_packer.py
+
+import re
+from typing import List, Optional
+
+from app.services.data_processing import document_key
+
+SHINGLE_SIZE = 3
+# Consecutive splitter chunks share up to chunk_overlap (100) chars; shorter matches are coincidence
+MIN_MERGE_OVERLAP = 20
+# Truncating a block to fewer tokens than this leaves nothing worth reading
+MIN_TRUNCATED_TOKENS = 40
+
+class TokenCounter:
+    """tiktoken's cl100k_base encoding, or a ~4 chars/token estimate if it can't be loaded.
+
+    Gemini has no local tokenizer, so either way this is an approximation that is
+    only used to keep the prompt within a budget.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
+            self.name = encoding_name
+        except Exception as e:
+            # The BPE file is downloaded on first use, which fails offline unless TIKTOKEN_CACHE_DIR has it
+            print(f"Warning: tiktoken encoding unavailable, estimating tokens from length: {e}")
+            self._encoding = None
+            self.name = "estimate"
+
+    def count(self, text: str) -> int:
+        if self._encoding is None:
+            return (len(text) + 3) // 4
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self._encoding is None:
+            return text[:max_tokens * 4]
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return self._encoding.decode(tokens[:max_tokens])
+
+def _merge_overlap(first: str, second: str) -> Optional[str]:
+    """first + second with their shared boundary written once, or None if they don't overlap."""
+    for size in range(min(len(first), len(second)), MIN_MERGE_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+def merge_chunks(texts: List[str]) -> List[str]:
+    """Stitches chunks of one parent document back together where they overlap."""
+    pieces = []
+    for text in texts:
+        if any(text in piece for piece in pieces):
+            continue
+        pieces = [piece for piece in pieces if piece not in text]
+        pieces.append(text)
+
+    merged = True
+    while merged and len(pieces) > 1:
+        merged = False
+        for i in range(len(pieces)):
+            for j in range(len(pieces)):
+                if i == j:
+                    continue
+                joined = _merge_overlap(pieces[i], pieces[j])
+                if joined is not None:
+                    pieces[i] = joined
+                    del pieces[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return pieces
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class ContextPacker:
+    """Fits retrieved chunks into a token budget for the explain prompt.
+
+    Chunks from the same source document are merged back into one block
+    (overlaps written once), blocks that near-duplicate a more relevant one
+    are dropped, and the rest are added in relevance order until the budget
+    is spent, truncating the last block if enough room is left.
+    """
+
+    def __init__(self, budget_tokens: int = 3000, duplicate_threshold: float = 0.7,
+                 counter: Optional[TokenCounter] = None):
+        self.budget_tokens = budget_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.counter = counter or TokenCounter()
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    @staticmethod
+    def _block(source: str, text: str) -> str:
+        return f"--- SOURCE: {source} ---\n{text}"
+
+    def pack(self, docs, scores: Optional[List[float]] = None):
+        """Returns (context_str, report) for docs ranked best-first.
+
+        scores, if given, are relevance scores aligned with docs (higher is
+        better); otherwise the retrieval rank is used.
+        """
+        if scores is None:
+            scores = [1.0 / (rank + 1) for rank in range(len(docs))]
+        naive = "\n\n".join(self._block(doc.metadata.get("source", "unknown"), doc.page_content) for doc in docs)
+        tokens_before = self.counter.count(naive)
+
+        # Group chunks by parent document, keeping each group's best score
+        groups = {}
+        for index, (doc, score) in enumerate(zip(docs, scores)):
+            key = document_key(doc.metadata or {}) or f"chunk:{index}"
+            group = groups.setdefault(key, {"source": doc.metadata.get("source", "unknown"), "texts": [], "score": score})
+            group["texts"].append(doc.page_content)
+            group["score"] = max(group["score"], score)
+
+        blocks = []
+        merged_chunks = 0
+        for group in sorted(groups.values(), key=lambda g: g["score"], reverse=True):
+            pieces = merge_chunks(group["texts"])
+            merged_chunks += len(group["texts"]) - len(pieces)
+            blocks.append((group["source"], "\n[...]\n".join(pieces)))
+
+        kept = []
+        kept_shingles = []
+        duplicates = 0
+        for source, text in blocks:
+            shingles = _shingles(text)
+            if any(_jaccard(shingles, seen) >= self.duplicate_threshold for seen in kept_shingles):
+                duplicates += 1
+                continue
+            kept.append((source, text))
+            kept_shingles.append(shingles)
+
+        packed = []
+        used = 0
+        dropped = 0
+        truncated = 0
+        separator = self.counter.count("\n\n")
+        for source, text in kept:
+            text = self._block(source, text)
+            gap = separator if packed else 0
+            cost = self.counter.count(text) + gap
+            if used + cost <= self.budget_tokens:
+                packed.append(text)
+                used += cost
+                continue
+            room = self.budget_tokens - used - gap
+            if room >= MIN_TRUNCATED_TOKENS:
+                packed.append(self.counter.truncate(text, room))
+                used += room + gap
+                truncated += 1
+            else:
+                dropped += 1
+
+        context_str = "\n\n".join(packed)
+        tokens_after = self.counter.count(context_str)
+        self.requests += 1
+        self.tokens_before += tokens_before
+        self.tokens_after += tokens_after
+        return context_str, {
+            "chunks": len(docs),
+            "blocks": len(packed),
+            "merged_chunks": merged_chunks,
+            "duplicates_dropped": duplicates,
+            "truncated": truncated,
+            "dropped_for_budget": dropped,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": max(tokens_before - tokens_after, 0)
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            "budget_tokens": self.budget_tokens,
+            "tokenizer": self.counter.name,
+            "requests": self.requests,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": max(self.tokens_before - self.tokens_after, 0)
+        }
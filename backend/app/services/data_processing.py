@@ -1,7 +1,65 @@
 
 from langchain_core.documents import Document
+from datetime import datetime
 import re
 
+from app.services.mention_index import CLOSED_STATUSES
+
+def document_key(metadata: dict):
+    """Stable key of the source document a chunk came from (Slack message, Jira issue, page)."""
+    source = metadata.get("source", "unknown")
+    if source == "slack":
+        if not metadata.get("timestamp"):
+            return None
+        return f"slack:{metadata.get('channel')}:{metadata.get('timestamp')}"
+    # Notion pages from process_notion_data use page_id; ingest_notion.py uses id
+    doc_id = metadata.get("id") or metadata.get("page_id")
+    return f"{source}:{doc_id}" if doc_id else None
+
+def epoch_seconds(value):
+    """Slack ts strings and Jira/Confluence/Notion ISO timestamps as epoch seconds, or None."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    # fromisoformat before 3.11 wants "+00:00", not "Z" or "+0000"
+    iso = re.sub(r"([+-]\d{2})(\d{2})$", r"\1:\2", str(value).replace("Z", "+00:00"))
+    try:
+        return datetime.fromisoformat(iso).timestamp()
+    except ValueError:
+        return None
+
+def metadata_where(filters):
+    """Chroma where clause for a ContextFilters, or None when nothing is filtered.
+
+    Only chunks ingested with an updated_at field can match a time range.
+    """
+    if filters is None:
+        return None
+    # Every filter narrows the result, so clauses are always combined with $and
+    clauses = []
+    if filters.sources:
+        clauses.append({"source": {"$in": list(filters.sources)}})
+    if filters.open_only:
+        closed = sorted({variant for status in CLOSED_STATUSES for variant in (status, status.capitalize(), status.upper())})
+        clauses.append({"source": "jira"})
+        clauses.append({"status": {"$nin": closed}})
+    if filters.channel:
+        clauses.append({"channel": filters.channel})
+    if filters.statuses:
+        clauses.append({"status": {"$in": list(filters.statuses)}})
+    if filters.author:
+        clauses.append({"$or": [{"user": filters.author}, {"creator": filters.author}]})
+    if filters.since is not None:
+        clauses.append({"updated_at": {"$gte": filters.since}})
+    if filters.until is not None:
+        clauses.append({"updated_at": {"$lte": filters.until}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
 def process_slack_data(data, channel_id):
     """Converts Slack messages into documents with metadata."""
     documents = []
@@ -12,13 +70,24 @@ def process_slack_data(data, channel_id):
             
         # Create "Meta-Chunk": Prepend Date and Author
         content = f"Date: {msg.get('ts')} | Author: {msg.get('user')} | Channel: {channel_id}\nMessage: {msg.get('text')}"
+        url = f"https://slack.com/archives/{channel_id}/p{msg.get('ts').replace('.', '')}" if msg.get('ts') else None
+        thread_ts = msg.get('thread_ts')
+        is_reply = bool(thread_ts) and thread_ts != msg.get('ts')
+        if is_reply:
+            # Thread replies keep a pointer to their parent so context reads as a conversation
+            content = f"Date: {msg.get('ts')} | Author: {msg.get('user')} | Channel: {channel_id} | Thread: {thread_ts}\nMessage: {msg.get('text')}"
+            url = f"{url}?thread_ts={thread_ts}&cid={channel_id}"
         meta = {
             "source": "slack",
             "user": msg.get('user'),
             "channel": channel_id,
             "timestamp": msg.get('ts'),
-            "url": f"https://slack.com/archives/{channel_id}/p{msg.get('ts').replace('.', '')}" if msg.get('ts') else None
+            "url": url
         }
+        if thread_ts:
+            meta["thread_ts"] = thread_ts
+        if epoch_seconds(msg.get('ts')) is not None:
+            meta["updated_at"] = epoch_seconds(msg.get('ts'))
         documents.append(Document(page_content=content, metadata=meta))
     return documents
 
@@ -35,6 +104,8 @@ def process_jira_data(data):
             "status": ticket['status'],
             "creator": ticket['creator']
         }
+        if epoch_seconds(ticket.get('updated')) is not None:
+            meta["updated_at"] = epoch_seconds(ticket.get('updated'))
         documents.append(Document(page_content=content, metadata=meta))
     return documents
 
@@ -54,6 +125,8 @@ def process_confluence_data(pages):
             "url": page.get('url'),
             "version": page.get('version')
         }
+        if epoch_seconds(page.get('last_modified')) is not None:
+            meta["updated_at"] = epoch_seconds(page.get('last_modified'))
         documents.append(Document(page_content=content, metadata=meta))
     return documents
 
@@ -70,5 +143,7 @@ def process_notion_data(pages):
             "url": page.get('url'),
             "last_edited": page.get('last_edited')
         }
+        if epoch_seconds(page.get('last_edited')) is not None:
+            meta["updated_at"] = epoch_seconds(page.get('last_edited'))
         documents.append(Document(page_content=content, metadata=meta))
     return documents
@@ -0,0 +1,131 @@
+# app/services/document_registry.py
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+class DocumentRegistry:
+    """Source document key -> the chunk IDs of its current version, plus tombstones.
+
+    Chunk IDs are content hashes, so an edited Slack message or a new page
+    version gets new chunks and the old ones are orphaned. Re-ingesting a
+    document replaces its chunk list; chunks no document references anymore
+    are returned to be tombstoned, and compaction later purges them from the
+    side stores. Persisted to SQLite.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (doc_key TEXT NOT NULL, chunk_id TEXT NOT NULL, position INTEGER NOT NULL, "
+            "PRIMARY KEY (doc_key, chunk_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_chunk ON chunks (chunk_id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tombstones (chunk_id TEXT PRIMARY KEY, doc_key TEXT NOT NULL, "
+            "bytes INTEGER NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+        # Checked on every lexical search, so kept in memory
+        self._tombstoned = {row[0] for row in self._conn.execute("SELECT chunk_id FROM tombstones")}
+
+    def __len__(self):
+        with self._lock:
+            (chunks,) = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()
+        return chunks
+
+    def is_tombstoned(self, chunk_id: str) -> bool:
+        return chunk_id in self._tombstoned
+
+    def chunk_ids(self, doc_key: str) -> List[str]:
+        """Chunk IDs of a document's current version, in document order."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE doc_key = ? ORDER BY position", (doc_key,)
+            )]
+
+    def doc_keys(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """chunk_id -> the key of a document that currently references it."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._conn.execute(
+                    f"SELECT chunk_id, doc_key FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                ))
+        return found
+
+    def register(self, pairs: Iterable[Tuple[str, str]]):
+        """Adds (doc_key, chunk_id) pairs without dropping anything (used to backfill)."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (doc_key, chunk_id, position) "
+                "SELECT ?1, ?2, COALESCE(MAX(position) + 1, 0) FROM chunks WHERE doc_key = ?1",
+                list(pairs)
+            )
+            self._conn.commit()
+
+    def replace(self, documents: Dict[str, List[str]]) -> Dict[str, str]:
+        """Sets each document's chunk list to exactly these IDs.
+
+        Returns chunk_id -> doc_key for the chunks that dropped out and are not
+        referenced by any other document, i.e. the ones to tombstone.
+        """
+        dropped = {}
+        with self._lock:
+            for doc_key, chunk_ids in documents.items():
+                chunk_ids = list(dict.fromkeys(chunk_ids))
+                current = {row[0] for row in self._conn.execute("SELECT chunk_id FROM chunks WHERE doc_key = ?", (doc_key,))}
+                for chunk_id in current.difference(chunk_ids):
+                    dropped[chunk_id] = doc_key
+                self._conn.execute("DELETE FROM chunks WHERE doc_key = ?", (doc_key,))
+                self._conn.executemany(
+                    "INSERT INTO chunks (doc_key, chunk_id, position) VALUES (?, ?, ?)",
+                    [(doc_key, chunk_id, position) for position, chunk_id in enumerate(chunk_ids)]
+                )
+                # Content that came back (e.g. an edit was reverted) is live again
+                self._conn.executemany("DELETE FROM tombstones WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+                self._tombstoned.difference_update(chunk_ids)
+            self._conn.commit()
+            return {
+                chunk_id: doc_key for chunk_id, doc_key in dropped.items()
+                if not self._conn.execute("SELECT 1 FROM chunks WHERE chunk_id = ? LIMIT 1", (chunk_id,)).fetchone()
+            }
+
+    def remove(self, doc_keys: List[str]) -> Dict[str, str]:
+        """Forgets deleted documents. Returns their unreferenced chunks, as replace() does."""
+        return self.replace({doc_key: [] for doc_key in doc_keys})
+
+    def tombstone(self, sizes: Dict[str, Tuple[str, int]]):
+        """Records removed chunks as chunk_id -> (doc_key, bytes) until compaction purges them."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tombstones (chunk_id, doc_key, bytes, created) VALUES (?, ?, ?, ?)",
+                [(chunk_id, doc_key, size, now) for chunk_id, (doc_key, size) in sizes.items()]
+            )
+            self._conn.commit()
+            self._tombstoned.update(sizes)
+
+    def pending_tombstones(self, limit: int) -> List[Tuple[str, str, int]]:
+        """Oldest tombstones first, as (chunk_id, doc_key, bytes)."""
+        with self._lock:
+            return list(self._conn.execute(
+                "SELECT chunk_id, doc_key, bytes FROM tombstones ORDER BY created ASC LIMIT ?", (limit,)
+            ))
+
+    def clear_tombstones(self, chunk_ids: List[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM tombstones WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.commit()
+            self._tombstoned.difference_update(chunk_ids)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            (documents,) = self._conn.execute("SELECT COUNT(DISTINCT doc_key) FROM chunks").fetchone()
+            (chunks,) = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()
+            (tombstones, tombstone_bytes) = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM tombstones").fetchone()
+        return {"documents": documents, "chunks": chunks, "tombstones": tombstones, "tombstone_bytes": tombstone_bytes}
@@ -0,0 +1,102 @@
+# app/services/embedding_batcher.py
+
+import asyncio
+import time
+from collections import Counter
+from typing import List
+
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.executors import get_executor
+
+class EmbeddingBatcher:
+    """Micro-batches query embeddings across concurrent requests.
+
+    Queries that miss the query cache wait up to window_ms for others to
+    arrive, then every pending query (at most max_batch_size per call) is
+    embedded with one embed_documents request and the vectors are handed back
+    to their waiters. A full batch is sent without waiting out the window.
+    """
+
+    def __init__(self, embeddings: CachedEmbeddings, window_ms: float = 5.0, max_batch_size: int = 64,
+                 executor: str = "retrieval"):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.executor = executor
+        self._pending = []  # (text, future, enqueued_at)
+        self._timer = None
+        # The loop only holds weak references to tasks, so in-flight batches are kept here
+        self._tasks = set()
+        self.batch_sizes = Counter()
+        self.texts = 0
+        self.waiters = 0
+        self.wait_seconds = 0.0
+
+    async def embed(self, text: str) -> List[float]:
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        vectors = {}
+        waiting = {}
+        for text in dict.fromkeys(texts):
+            vector = self.embeddings.cached_query(text)
+            if vector is not None:
+                vectors[text] = vector
+            else:
+                waiting[text] = self._enqueue(text)
+        if waiting:
+            results = await asyncio.gather(*waiting.values())
+            vectors.update(zip(waiting, results))
+        return [vectors[text] for text in texts]
+
+    def _enqueue(self, text: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        start = time.perf_counter()
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batch_sizes[len(texts)] += 1
+        self.texts += len(texts)
+        self.waiters += len(batch)
+        self.wait_seconds += sum(start - enqueued for _, _, enqueued in batch)
+        try:
+            vectors = await get_executor(self.executor).run(self.embeddings.embed_query_misses, texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def get_stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / batches, 2) if batches else 0.0,
+            "avg_wait_ms": round(self.wait_seconds / self.waiters * 1000, 3) if self.waiters else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())}
+        }
@@ -0,0 +1,221 @@
+# app/services/embedding_cache.py
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+
+
+def content_hash(text: str) -> str:
+    """MD5 of the chunk text. This is also the chunk ID used in the vector store."""
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """In-process LRU cache for query vectors, bounded by bytes and entry age."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries = OrderedDict()  # key -> (stored_at, float32 vector)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(key: str, vector: array) -> int:
+        return len(key) + vector.itemsize * len(vector)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, vector = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector.tolist()
+
+    def put(self, key: str, vector: List[float]):
+        packed = array("f", vector)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), packed)
+            self._bytes += self._entry_size(key, packed)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        _, vector = self._entries.pop(key)
+        self._bytes -= self._entry_size(key, vector)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model with a persistent, size-bounded vector cache.
+
+    Document vectors are keyed by (model, content hash), so a chunk whose text
+    has not changed is never sent to the embedding API again. Query vectors
+    are kept in memory only, see QueryEmbeddingCache.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, db_path: str, max_entries: int = 100000,
+                 query_cache: Optional[QueryEmbeddingCache] = None, query_task_type: Optional[str] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        # Passed as task_type when queries are embedded in bulk, so batched and
+        # single query vectors match (GoogleGenerativeAIEmbeddings distinguishes them)
+        self.query_task_type = query_task_type
+        self.max_entries = max_entries
+        self.query_cache = query_cache or QueryEmbeddingCache()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, chunk_id TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, chunk_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def _lookup(self, chunk_ids: List[str]) -> dict:
+        found = {}
+        now = time.time()
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT chunk_id, vector FROM embeddings WHERE model = ? AND chunk_id IN ({placeholders})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                for chunk_id, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[chunk_id] = vector.tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND chunk_id = ?",
+                    [(now, self.model_name, chunk_id) for chunk_id in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, chunk_ids: List[str], vectors: List[List[float]]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, chunk_id, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model_name, chunk_id, array("f", vector).tobytes(), now)
+                 for chunk_id, vector in zip(chunk_ids, vectors)]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops the least recently used vectors once the cache exceeds max_entries."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        chunk_ids = [content_hash(text) for text in texts]
+        cached = self._lookup(list(set(chunk_ids)))
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing = {}
+        for chunk_id, text in zip(chunk_ids, texts):
+            if chunk_id not in cached and chunk_id not in missing:
+                missing[chunk_id] = text
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self._store(list(missing.keys()), vectors)
+            cached.update(zip(missing.keys(), vectors))
+
+        return [cached[chunk_id] for chunk_id in chunk_ids]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = content_hash(text)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.query_cache.put(key, vector)
+        return vector
+
+    def cached_query(self, text: str) -> Optional[List[float]]:
+        """The query-cache vector for text, or None on a miss."""
+        return self.query_cache.get(content_hash(text))
+
+    def embed_query_misses(self, texts: List[str]) -> List[List[float]]:
+        """Embeds queries already known to miss the query cache in one call, and caches them."""
+        if self.query_task_type:
+            embedded = self.embeddings.embed_documents(texts, task_type=self.query_task_type)
+        else:
+            embedded = self.embeddings.embed_documents(texts)
+        for text, vector in zip(texts, embedded):
+            self.query_cache.put(content_hash(text), vector)
+        return embedded
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeds many queries with a single embed_documents call for the cache misses."""
+        vectors = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            vector = self.cached_query(text)
+            if vector is None:
+                missing.append(text)
+            else:
+                vectors[text] = vector
+
+        if missing:
+            vectors.update(zip(missing, self.embed_query_misses(missing)))
+
+        return [vectors[text] for text in texts]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": size,
+            "max_entries": self.max_entries
+        }
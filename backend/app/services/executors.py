@@ -0,0 +1,102 @@
+# app/services/executors.py
+
+import os
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Interactive retrieval (embedding + vector search) and background ingestion
+# (connector I/O + add_documents) get separate pools so a sync can't starve
+# CodeLens/sidebar requests. Sizes are overridable via <NAME>_POOL_SIZE.
+DEFAULT_POOL_SIZES = {
+    "retrieval": 8,
+    "ingest": 4,
+}
+
+class InstrumentedExecutor:
+    """Thread pool that keeps queue depth and wait-time numbers for /metrics."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.max_wait = 0.0
+        self._total_wait = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs a blocking callable on the pool without blocking the event loop."""
+        submitted = time.perf_counter()
+
+        def task():
+            wait = time.perf_counter() - submitted
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self._total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                self._recent_waits.append(wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        with self._lock:
+            self.queued += 1
+        future = self._executor.submit(task)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A task cancelled before it started never runs, so it has to leave the queue here
+            if future.cancel():
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            started = self.active + self.completed
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 2) if started else 0.0,
+                "p50_wait_ms": round(waits[len(waits) // 2] * 1000, 2) if waits else 0.0,
+                "p99_wait_ms": round(waits[int(len(waits) * 0.99)] * 1000, 2) if waits else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2)
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def get_executor(name: str) -> InstrumentedExecutor:
+    """Returns the named pool, creating it on first use."""
+    with _executors_lock:
+        if name not in _executors:
+            size = int(os.environ.get(f"{name.upper()}_POOL_SIZE", DEFAULT_POOL_SIZES.get(name, 4)))
+            _executors[name] = InstrumentedExecutor(name, size)
+        return _executors[name]
+
+def get_executor_stats() -> dict:
+    with _executors_lock:
+        return {name: executor.get_stats() for name, executor in _executors.items()}
+
+def shutdown_executors():
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
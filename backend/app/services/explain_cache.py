@@ -0,0 +1,107 @@
+# app/services/explain_cache.py
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+
+class ExplainCache:
+    """Persistent cache of /explain answers with LRU eviction.
+
+    Entries are keyed by the normalized snippet, the exact set of retrieved
+    chunk IDs and the prompt/model version, and remember which chunks they were
+    built from so re-ingesting any of those chunks drops the entry.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations (cache_key TEXT PRIMARY KEY, markdown TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanation_chunks (cache_key TEXT NOT NULL, chunk_id TEXT NOT NULL, "
+            "PRIMARY KEY (cache_key, chunk_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_explanation_chunks_chunk ON explanation_chunks (chunk_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_explanations_last_used ON explanations (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(snippet: str, chunk_ids: Iterable[str], version: str) -> str:
+        payload = "\n".join([version, snippet, *sorted(set(chunk_ids))])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, cache_key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT markdown FROM explanations WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE explanations SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, cache_key: str, markdown: str, chunk_ids: Iterable[str]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations (cache_key, markdown, created, last_used) VALUES (?, ?, ?, ?)",
+                (cache_key, markdown, now, now)
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO explanation_chunks (cache_key, chunk_id) VALUES (?, ?)",
+                [(cache_key, chunk_id) for chunk_id in set(chunk_ids)]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            keys = [row[0] for row in self._conn.execute(
+                "SELECT cache_key FROM explanations ORDER BY last_used ASC LIMIT ?", (excess,)
+            )]
+            self._delete(keys)
+
+    def _delete(self, keys: List[str]):
+        self._conn.executemany("DELETE FROM explanations WHERE cache_key = ?", [(k,) for k in keys])
+        self._conn.executemany("DELETE FROM explanation_chunks WHERE cache_key = ?", [(k,) for k in keys])
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str]) -> int:
+        """Drops every cached answer that used any of these chunks. Returns how many were dropped."""
+        chunk_ids = list(set(chunk_ids))
+        if not chunk_ids:
+            return 0
+        with self._lock:
+            keys = set()
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                keys.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT cache_key FROM explanation_chunks WHERE chunk_id IN ({placeholders})", batch
+                ))
+            if keys:
+                self._delete(list(keys))
+                self._conn.commit()
+                self.invalidated += len(keys)
+        return len(keys)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "entries": size,
+            "max_entries": self.max_entries
+        }
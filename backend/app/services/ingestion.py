@@ -0,0 +1,107 @@
+# app/services/ingestion.py
+
+import os
+import time
+from app.services.data_processing import process_slack_data
+from app.services.embedding_cache import content_hash
+
+SLACK_INGEST_BATCH_SIZE = int(os.environ.get("SLACK_INGEST_BATCH_SIZE", "500"))
+# Threads with a reply in this window keep being polled for new replies after their parent leaves the sync range
+SLACK_THREAD_WINDOW_DAYS = float(os.environ.get("SLACK_THREAD_WINDOW_DAYS", "7"))
+# At most this many of those threads are polled per sync, taking turns across syncs
+SLACK_THREAD_POLLS_PER_SYNC = int(os.environ.get("SLACK_THREAD_POLLS_PER_SYNC", "20"))
+
+def _next_threads(active_threads: dict, cursor: str = None, limit: int = SLACK_THREAD_POLLS_PER_SYNC):
+    """Up to limit thread ts in ts order, starting after cursor and wrapping around."""
+    ordered = sorted(active_threads)
+    if cursor:
+        ordered = [ts for ts in ordered if ts > cursor] + [ts for ts in ordered if ts <= cursor]
+    return ordered[:limit]
+
+def ingest_slack_channel(integrations, rag, channel_id: str, oldest: str = None, batch_size: int = SLACK_INGEST_BATCH_SIZE,
+                         active_threads: dict = None, thread_cursor: str = None) -> dict:
+    """Streams a channel's history, thread replies included, into the vector store.
+
+    Messages are processed and embedded in fixed-size batches, so only one batch
+    is held in memory no matter how long the channel is. Returns counts plus the
+    newest top-level ts seen, which is the next sync watermark, and "threads":
+    active_threads (thread ts -> newest reply ts) updated with what was seen and
+    pruned to SLACK_THREAD_WINDOW_DAYS, for the next sync to poll.
+
+    Only SLACK_THREAD_POLLS_PER_SYNC of the active threads are polled, the
+    ones after thread_cursor; the returned "thread_cursor" continues the
+    rotation next time.
+    """
+    stats = {
+        "items": 0,
+        "replies": 0,
+        "documents": 0,
+        "chunks": {"new": 0, "unchanged": 0, "patched": 0, "replaced": 0, "superseded": 0},
+        "newest_ts": None
+    }
+    threads = dict(active_threads or {})
+    polled = _next_threads(threads, thread_cursor)
+    stats["polled_threads"] = len(polled)
+    stats["thread_cursor"] = polled[-1] if polled else None
+    cutoff = f"{time.time() - SLACK_THREAD_WINDOW_DAYS * 86400:.6f}"
+    batch = []
+
+    def saw_reply(thread_ts, reply_ts):
+        if reply_ts and reply_ts > threads.get(thread_ts, ""):
+            threads[thread_ts] = reply_ts
+
+    def flush():
+        docs = process_slack_data(batch, channel_id)
+        if docs:
+            counts = rag.add_documents(docs)
+            for key, value in (counts or {}).items():
+                stats["chunks"][key] += value
+        stats["documents"] += len(docs)
+        batch.clear()
+
+    polling = {ts: threads[ts] for ts in polled}
+    for messages in integrations.iter_channel_messages(channel_id, oldest=oldest, active_threads=polling):
+        for msg in messages:
+            thread_ts = msg.get("thread_ts")
+            if thread_ts and thread_ts != msg.get("ts"):
+                stats["replies"] += 1
+                saw_reply(thread_ts, msg.get("ts"))
+            else:
+                stats["items"] += 1
+                # Slack ts strings are fixed-width, so the lexicographic max is the newest
+                if msg.get("ts") and (stats["newest_ts"] is None or msg["ts"] > stats["newest_ts"]):
+                    stats["newest_ts"] = msg["ts"]
+                if msg.get("replies_failed"):
+                    # Poll it later from what was last seen, or from the start of the window
+                    threads[msg["ts"]] = max(threads.get(msg["ts"], msg["ts"]), cutoff)
+                elif msg.get("reply_count"):
+                    saw_reply(msg["ts"], msg.get("latest_reply"))
+            batch.append(msg)
+            if len(batch) >= batch_size:
+                flush()
+
+    if batch:
+        flush()
+    stats["threads"] = {ts: latest for ts, latest in threads.items() if latest >= cutoff}
+    return stats
+
+def jira_text_hash(ticket: dict) -> str:
+    """Hash of the fields that end up in a ticket's chunk text."""
+    return content_hash(f"{ticket['key']}\n{ticket['summary']}\n{ticket['description'] or ''}")
+
+def split_jira_changes(tickets, known: dict):
+    """Splits updated tickets into (text_changed, status_only).
+
+    known maps issue key -> {"text": jira_text_hash, "status": status} as of the
+    last ingest. Tickets where neither changed (e.g. only a comment or assignee
+    moved) are dropped, and unknown tickets count as text changes.
+    """
+    text_changed = []
+    status_only = []
+    for ticket in tickets:
+        previous = known.get(ticket["key"])
+        if not previous or previous.get("text") != jira_text_hash(ticket):
+            text_changed.append(ticket)
+        elif previous.get("status") != ticket["status"]:
+            status_only.append(ticket)
+    return text_changed, status_only
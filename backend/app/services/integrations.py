@@ -1,15 +1,112 @@
 import os
+import re
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
 from jira import JIRA
 from atlassian import Confluence
-from notion_client import Client
+from notion_client import Client, APIResponseError, APIErrorCode
+
+JIRA_FIELDS = "summary,description,status,resolution,creator,updated"
+JIRA_FETCH_CONCURRENCY = int(os.environ.get("JIRA_FETCH_CONCURRENCY", "4"))
+# Ask CQL search to return bodies and versions inline instead of one GET per hit
+CONFLUENCE_EXPAND = "content.body.storage,content.version"
+# Fallback per-page fetches (when the search response lacks bodies) run at most this wide
+CONFLUENCE_FETCH_CONCURRENCY = int(os.environ.get("CONFLUENCE_FETCH_CONCURRENCY", "4"))
+
+# Notion allows an average of 3 requests/second per integration
+NOTION_RATE_LIMIT = float(os.environ.get("NOTION_RATE_LIMIT", "3"))
+NOTION_FETCH_CONCURRENCY = int(os.environ.get("NOTION_FETCH_CONCURRENCY", "3"))
+SLACK_THREAD_CONCURRENCY = int(os.environ.get("SLACK_THREAD_CONCURRENCY", "4"))
+# Child pages/databases are separate pages in search results, not nested content
+NOTION_SKIP_CHILDREN = {"child_page", "child_database"}
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class RateLimiter:
+    """Thread-safe token bucket: allows `rate` calls per second with bursts up to `rate`."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class NotionPageCache:
+    """Converted page text keyed by (page ID, last_edited_time), persisted in SQLite.
+
+    Only the latest version of each page is kept; an unchanged page costs zero
+    block API calls.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS notion_pages (page_id TEXT PRIMARY KEY, last_edited TEXT NOT NULL, content TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, page_id: str, last_edited: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM notion_pages WHERE page_id = ? AND last_edited = ?", (page_id, last_edited)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, page_id: str, last_edited: str, content: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO notion_pages (page_id, last_edited, content) VALUES (?, ?, ?)",
+                (page_id, last_edited, content)
+            )
+            self._conn.commit()
+
+# Widest gap between UTC and a user timezone (UTC+14); see _atlassian_minute
+ATLASSIAN_TZ_MARGIN = timedelta(hours=14)
+
+def _split_order_by(query: str):
+    """Splits 'filter ORDER BY ...' so a delta condition can be ANDed onto the filter."""
+    parts = re.split(r"\s+ORDER\s+BY\s+", query, maxsplit=1, flags=re.IGNORECASE)
+    return parts[0], (parts[1] if len(parts) > 1 else None)
+
+def _atlassian_minute(timestamp: str) -> str:
+    """Formats an ISO timestamp as the 'yyyy/MM/dd HH:mm' literal JQL/CQL expect.
+
+    JQL/CQL read the literal in the API user's timezone, which can be anywhere
+    from UTC-12 to UTC+14, while stored watermarks may be in UTC (Confluence's
+    version.when) or another offset. So the time is converted to UTC and moved
+    back ATLASSIAN_TZ_MARGIN, which is never later than the watermark in any
+    timezone. Re-reading the margin is cheap: unchanged issues and pages are
+    skipped and chunk IDs are content hashes.
+    """
+    parsed = datetime.strptime(timestamp.replace("Z", "+0000"), "%Y-%m-%dT%H:%M:%S.%f%z")
+    return (parsed.astimezone(timezone.utc) - ATLASSIAN_TZ_MARGIN).strftime("%Y/%m/%d %H:%M")
 
 class IntegrationService:
     def __init__(self):
         # Slack Initialization
         self.slack_token = os.environ.get("SLACK_BOT_TOKEN")
         self.slack_client = WebClient(token=self.slack_token)
+        # Back off on HTTP 429 instead of failing a long history walk
+        self.slack_client.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=3))
         
         # Jira Initialization
         jira_domain = os.environ.get("JIRA_DOMAIN")
@@ -27,8 +124,11 @@ class IntegrationService:
                 server=jira_server,
                 basic_auth=(jira_email, jira_token)
             )
+            # Jira Cloud only pages searches by nextPageToken; startAt is Server/Data Center only
+            self.jira_cloud = ".atlassian.net" in jira_server or bool(getattr(self.jira, "_is_cloud", False))
         else:
             self.jira = None
+            self.jira_cloud = False
             print("Warning: Jira credentials missing.")
 
         # Confluence Initialization
@@ -51,6 +151,10 @@ class IntegrationService:
         self.notion_token = os.environ.get("NOTION_API_KEY")
         if self.notion_token:
             self.notion = Client(auth=self.notion_token)
+            self.notion_limiter = RateLimiter(NOTION_RATE_LIMIT)
+            self.notion_cache = NotionPageCache(
+                os.environ.get("NOTION_CACHE_PATH", os.path.join(BACKEND_ROOT, "notion_cache.db"))
+            )
         else:
             self.notion = None
             print("Warning: Notion credentials missing.")
@@ -108,50 +212,248 @@ class IntegrationService:
             print(f"Slack API Error: {e}")
             return []
 
+    def iter_channel_history(self, channel_id: str, oldest: str = None, page_size=200):
+        """Yields a channel's history one cursor page at a time, newest first.
+
+        Walks the whole history (or everything after the `oldest` ts). Errors
+        propagate so callers never mistake a truncated walk for a complete one.
+        """
+        cursor = None
+        while True:
+            kwargs = {"channel": channel_id, "limit": page_size}
+            if oldest:
+                kwargs["oldest"] = oldest
+            if cursor:
+                kwargs["cursor"] = cursor
+            result = self.slack_client.conversations_history(**kwargs)
+            yield result.get("messages", [])
+            cursor = result.get("response_metadata", {}).get("next_cursor")
+            if not result.get("has_more") or not cursor:
+                return
+
+    def fetch_thread_replies(self, channel_id: str, thread_ts: str, page_size=200, oldest: str = None):
+        """Fetches every reply in a thread (without the parent message), or only those after `oldest`."""
+        replies = []
+        cursor = None
+        while True:
+            kwargs = {"channel": channel_id, "ts": thread_ts, "limit": page_size}
+            if oldest:
+                kwargs["oldest"] = oldest
+            if cursor:
+                kwargs["cursor"] = cursor
+            result = self.slack_client.conversations_replies(**kwargs)
+            replies.extend(m for m in result.get("messages", []) if m.get("ts") != thread_ts)
+            cursor = result.get("response_metadata", {}).get("next_cursor")
+            if not result.get("has_more") or not cursor:
+                return replies
+
+    def _thread_replies_or_none(self, channel_id: str, thread_ts: str, page_size=200, oldest: str = None):
+        """fetch_thread_replies, or None if it failed; one thread (e.g. a rate limit) must not fail the channel."""
+        try:
+            return self.fetch_thread_replies(channel_id, thread_ts, page_size, oldest=oldest)
+        except Exception as e:
+            print(f"Slack API Error fetching replies of thread {thread_ts}: {e}")
+            return None
+
+    def iter_channel_messages(self, channel_id: str, oldest: str = None, page_size=200, active_threads: dict = None):
+        """Yields history pages with each page's thread replies fetched alongside.
+
+        Replies are fetched with up to SLACK_THREAD_CONCURRENCY concurrent
+        conversations.replies calls. Threads whose parent is inside the walked
+        range are expanded in full; if that fails, the parent is marked
+        "replies_failed" so the caller can poll it later. active_threads maps
+        older thread parents' ts to the newest reply ts already seen; after the
+        walk those threads are polled for newer replies, which come as one last
+        page. A thread that fails to poll is skipped.
+        """
+        expanded = set()
+        with ThreadPoolExecutor(max_workers=SLACK_THREAD_CONCURRENCY) as pool:
+            for messages in self.iter_channel_history(channel_id, oldest=oldest, page_size=page_size):
+                parents = [m for m in messages if m.get("reply_count")]
+                expanded.update(m["ts"] for m in parents)
+                replies = pool.map(lambda m: self._thread_replies_or_none(channel_id, m["ts"]), parents)
+                for parent, thread in zip(parents, list(replies)):
+                    if thread is None:
+                        parent["replies_failed"] = True
+                    else:
+                        messages.extend(thread)
+                yield messages
+
+            older = [(ts, latest) for ts, latest in (active_threads or {}).items() if ts not in expanded]
+            if older:
+                replies = pool.map(
+                    lambda thread: self._thread_replies_or_none(channel_id, thread[0], page_size, oldest=thread[1]), older
+                )
+                yield [reply for thread in replies if thread for reply in thread]
+
     def search_jira_tickets(self, jql: str, limit=50):
         """Searches for Jira tickets using JQL."""
         if not self.jira:
             return []
         try:
-            # fields='summary,description,status,creator,created'
-            issues = self.jira.search_issues(jql, maxResults=limit)
-            return [{
-                "key": i.key,
-                "summary": i.fields.summary,
-                "description": i.fields.description,
-                "status": i.fields.status.name,
-                "creator": i.fields.creator.displayName
-            } for i in issues]
+            # Only request the fields we read instead of every field on the issue
+            issues = self.jira.search_issues(jql, maxResults=limit, fields=JIRA_FIELDS)
+            return [self._issue_to_dict(i) for i in issues]
+        except Exception as e:
+            print(f"Jira API Error: {e}")
+            return []
+
+    def _issue_to_dict(self, issue):
+        return {
+            "key": issue.key,
+            "summary": issue.fields.summary,
+            "description": issue.fields.description,
+            "status": issue.fields.status.name,
+            "resolution": issue.fields.resolution.name if getattr(issue.fields, "resolution", None) else None,
+            "creator": issue.fields.creator.displayName,
+            "updated": getattr(issue.fields, "updated", None)
+        }
+
+    def search_jira_tickets_since(self, jql: str, updated_since: str = None, backfill_days=30, page_size=100,
+                                  include_resolved=False):
+        """Fetches every issue matching jql that was updated since the watermark, oldest first.
+
+        include_resolved also returns resolved issues outside jql, so a caller
+        whose jql excludes them (resolution = Unresolved) still sees closures.
+        Returns [] on any error so a partial page can't advance the caller's watermark.
+        """
+        if not self.jira:
+            return []
+        base, _ = _split_order_by(jql)
+        try:
+            if updated_since:
+                delta = f'updated >= "{_atlassian_minute(updated_since)}"'
+            else:
+                delta = f"updated >= -{backfill_days}d"
+            if include_resolved:
+                base = f"({base}) OR resolution IS NOT EMPTY"
+            delta_jql = f"({base}) AND {delta} ORDER BY updated ASC"
+            return self._search_jira_paged(delta_jql, page_size)
         except Exception as e:
             print(f"Jira API Error: {e}")
             return []
 
+    def _search_jira_paged(self, jql: str, page_size: int):
+        """Runs a field-projected JQL search over all result pages.
+
+        On Jira Cloud pages are chained by nextPageToken, so they are fetched
+        one after another. On Server/Data Center the first page reports the
+        total; the remaining startAt offsets are then fetched concurrently
+        (JIRA_FETCH_CONCURRENCY) and stitched back in order.
+        """
+        if self.jira_cloud:
+            issues = []
+            token = None
+            while True:
+                page = self.jira.enhanced_search_issues(jql, nextPageToken=token, maxResults=page_size, fields=JIRA_FIELDS)
+                issues.extend(page)
+                token = page.nextPageToken
+                if not token:
+                    break
+            return [self._issue_to_dict(issue) for issue in issues]
+
+        def fetch_page(start_at):
+            return self.jira.search_issues(jql, startAt=start_at, maxResults=page_size, fields=JIRA_FIELDS)
+
+        first = fetch_page(0)
+        pages = [first]
+        # Step by what the server actually returned, in case it caps maxResults
+        step = len(first)
+        offsets = list(range(step, first.total, step)) if step else []
+        if offsets:
+            with ThreadPoolExecutor(max_workers=JIRA_FETCH_CONCURRENCY) as pool:
+                pages.extend(pool.map(fetch_page, offsets))
+        return [self._issue_to_dict(issue) for page in pages for issue in page]
+
     def search_confluence_pages(self, cql: str, limit=10):
         """Searches for Confluence pages using CQL."""
         if not self.confluence:
             return []
         try:
-            results = self.confluence.cql(cql, limit=limit)
+            results = self.confluence.cql(cql, limit=limit, expand=CONFLUENCE_EXPAND)
+            return self._confluence_pages_from_results(results.get("results", []))
+        except Exception as e:
+            print(f"Confluence API Error: {e}")
+            return []
+
+    def _confluence_pages_from_results(self, results, known_versions=None):
+        """Builds page dicts from CQL hits, skipping pages whose version was already synced.
+
+        Hits that came back with body and version expanded need no further request;
+        any others are fetched by ID in a bounded pool.
+        """
+        known_versions = known_versions or {}
+
+        def is_unchanged(page_id, version):
+            return version is not None and known_versions.get(page_id) == version
+
+        pages = []
+        missing = []
+        for result in results:
+            content = result["content"]
+            version = content.get("version", {}).get("number")
+            if is_unchanged(content["id"], version):
+                continue
+            if "body" in content and "version" in content:
+                pages.append(self._confluence_page_dict(result, content))
+            else:
+                missing.append(result)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=CONFLUENCE_FETCH_CONCURRENCY) as pool:
+                fetched = pool.map(self._fetch_confluence_page, missing)
+                pages.extend(page for page in fetched if not is_unchanged(page["id"], page["version"]))
+        return pages
+
+    def _fetch_confluence_page(self, result):
+        """Fetches full content for a CQL search hit."""
+        page_full = self.confluence.get_page_by_id(result["content"]["id"], expand="body.storage,version")
+        return self._confluence_page_dict(result, page_full)
+
+    def _confluence_page_dict(self, result, content):
+        # Construct simplified URL
+        base = self.confluence_url.rstrip('/')
+        # result['url'] is typically /spaces/SPACE/pages/ID/Title
+        relative_url = result.get("url", "")
+        full_url = f"{base}{relative_url}"
+
+        return {
+            "id": result["content"]["id"],
+            "title": result["content"]["title"],
+            "url": full_url,
+            "body": content["body"]["storage"]["value"],
+            "version": content["version"]["number"],
+            "last_modified": content["version"]["when"]
+        }
+
+    def search_confluence_pages_since(self, cql: str, modified_since: str = None, backfill_days=30, page_size=50,
+                                      known_versions=None):
+        """Fetches every page matching cql that was modified since the watermark, oldest first.
+
+        Pages whose version number matches known_versions ({page_id: version})
+        are skipped. Returns [] on any error so a partial result can't advance
+        the caller's watermark.
+        """
+        if not self.confluence:
+            return []
+        base, _ = _split_order_by(cql)
+        try:
+            if modified_since:
+                # CQL compares at minute granularity, so ">=" re-reads the boundary
+                # minute rather than missing edits made later within it
+                delta = f'lastmodified >= "{_atlassian_minute(modified_since)}"'
+            else:
+                delta = f'lastmodified >= now("-{backfill_days}d")'
+            delta_cql = f"({base}) AND {delta} ORDER BY lastmodified ASC"
             pages = []
-            for result in results.get("results", []):
-                # Fetch full content for the page
-                page_id = result["content"]["id"]
-                page_full = self.confluence.get_page_by_id(page_id, expand="body.storage,version")
-                
-                # Construct simplified URL
-                base = self.confluence_url.rstrip('/')
-                # result['url'] is typically /spaces/SPACE/pages/ID/Title
-                relative_url = result.get("url", "")
-                full_url = f"{base}{relative_url}"
-                
-                pages.append({
-                    "id": page_id,
-                    "title": result["content"]["title"],
-                    "url": full_url,
-                    "body": page_full["body"]["storage"]["value"],
-                    "version": page_full["version"]["number"],
-                    "last_modified": page_full["version"]["when"]
-                })
+            start = 0
+            while True:
+                results = self.confluence.cql(delta_cql, start=start, limit=page_size, expand=CONFLUENCE_EXPAND)
+                batch = results.get("results", [])
+                pages.extend(self._confluence_pages_from_results(batch, known_versions))
+                start += len(batch)
+                if not batch or "next" not in results.get("_links", {}):
+                    break
             return pages
         except Exception as e:
             print(f"Confluence API Error: {e}")
@@ -166,64 +468,195 @@ class IntegrationService:
             response = self.notion.search(query=query, page_size=limit)
             results = response.get("results", [])
             
-            pages = []
-            for page in results:
-                try:
-                    # We only want pages, not databases for simplicity, or handle both
-                    if page["object"] == "page":
-                        # Get title
-                        title = "Untitled"
-                        props = page.get("properties", {})
-                        # Iterate to find the 'title' property type
-                        for key, val in props.items():
-                            if val["type"] == "title" and val["title"]:
-                                title = val["title"][0]["plain_text"]
-                                break
-                        
-                        # Get content (blocks)
-                        # Note: Fetching blocks for each page is expensive, so we limit to top 100 blocks
-                        blocks = self.notion.blocks.children.list(block_id=page["id"], page_size=100)
-                        
-                        content_text = ""
-                        for block in blocks.get("results", []):
-                            btype = block["type"]
-                            text_content = ""
-                            
-                            # Handle different block types
-                            if "rich_text" in block.get(btype, {}):
-                                text_list = block[btype]["rich_text"]
-                                if text_list:
-                                    text_content = "".join([t["plain_text"] for t in text_list])
-
-                            if btype == "paragraph":
-                                content_text += text_content + "\n"
-                            elif btype in ["heading_1", "heading_2", "heading_3"]:
-                                content_text += f"\n# {text_content}\n"
-                            elif btype == "bulleted_list_item":
-                                content_text += f"- {text_content}\n"
-                            elif btype == "numbered_list_item":
-                                content_text += f"1. {text_content}\n"
-                            elif btype == "code":
-                                # Code blocks store text in 'rich_text' inside 'code' object, plus language
-                                code_lang = block[btype].get("language", "text")
-                                content_text += f"\n```{code_lang}\n{text_content}\n```\n"
-                            elif btype == "to_do":
-                                checked = "[x]" if block[btype].get("checked") else "[ ]"
-                                content_text += f"{checked} {text_content}\n"
-                        
-                        pages.append({
-                            "id": page["id"],
-                            "title": title,
-                            "url": page["url"],
-                            "content": content_text,
-                            "last_edited": page["last_edited_time"]
-                        })
-                except Exception as e:
-                    print(f"Error processing Notion page {page.get('id')}: {e}")
-                    continue
+            # We only want pages, not databases for simplicity, or handle both
+            return self._notion_pages_to_dicts([page for page in results if page["object"] == "page"])
 
-            return pages
+        except Exception as e:
+            print(f"Notion API Error: {e}")
+            return []
 
+    def search_notion_pages_since(self, query: str = "", edited_since: str = None, backfill_days=30, page_size=100):
+        """Fetches every page matching query that was edited since the watermark.
+
+        Search results are walked newest-first and pagination stops at the first
+        page older than the watermark. Returns [] on search errors so a partial
+        result can't advance the caller's watermark. Pages whose blocks could
+        not be fetched come back as {"id", "last_edited", "failed": True}, so
+        the caller can hold its watermark at the oldest of them.
+        """
+        if not self.notion:
+            return []
+        if not edited_since:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=backfill_days)
+            edited_since = cutoff.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+        try:
+            changed = []
+            cursor = None
+            while True:
+                kwargs = {
+                    "query": query,
+                    "page_size": page_size,
+                    "filter": {"property": "object", "value": "page"},
+                    "sort": {"direction": "descending", "timestamp": "last_edited_time"}
+                }
+                if cursor:
+                    kwargs["start_cursor"] = cursor
+                response = self.notion.search(**kwargs)
+
+                reached_watermark = False
+                for page in response.get("results", []):
+                    # last_edited_time is rounded to the minute, so pages edited in the
+                    # watermark's minute are re-read rather than skipped
+                    if page["last_edited_time"] < edited_since:
+                        reached_watermark = True
+                        break
+                    changed.append(page)
+
+                cursor = response.get("next_cursor")
+                if reached_watermark or not response.get("has_more") or not cursor:
+                    break
         except Exception as e:
             print(f"Notion API Error: {e}")
             return []
+
+        return self._notion_pages_to_dicts(changed, keep_failed=True)
+
+    def _notion_pages_to_dicts(self, pages, keep_failed=False):
+        """Converts search results to page dicts, reusing cached text for unchanged pages.
+
+        Pages whose block fetch failed are dropped, or with keep_failed returned
+        as failure markers in their place.
+        """
+        contents = {}
+        to_fetch = []
+        for page in pages:
+            cached = self.notion_cache.get(page["id"], page["last_edited_time"])
+            if cached is not None:
+                contents[page["id"]] = cached
+            else:
+                to_fetch.append(page)
+
+        if to_fetch:
+            children, failed = self._fetch_block_trees([page["id"] for page in to_fetch])
+            for page in to_fetch:
+                if page["id"] in failed:
+                    print(f"Error processing Notion page {page['id']}: block fetch failed")
+                    continue
+                content = self._blocks_to_text(children.get(page["id"], []), children)
+                self.notion_cache.put(page["id"], page["last_edited_time"], content)
+                contents[page["id"]] = content
+
+        results = []
+        for page in pages:
+            if page["id"] not in contents:
+                if keep_failed:
+                    results.append({"id": page["id"], "last_edited": page["last_edited_time"], "failed": True})
+                continue
+            # Get title
+            title = "Untitled"
+            props = page.get("properties", {})
+            # Iterate to find the 'title' property type
+            for key, val in props.items():
+                if val["type"] == "title" and val["title"]:
+                    title = val["title"][0]["plain_text"]
+                    break
+
+            results.append({
+                "id": page["id"],
+                "title": title,
+                "url": page["url"],
+                "content": contents[page["id"]],
+                "last_edited": page["last_edited_time"]
+            })
+        return results
+
+    def _list_block_children(self, block_id: str):
+        """Lists all children of a block, following has_more/next_cursor under the rate limit."""
+        blocks = []
+        cursor = None
+        retries = 0
+        while True:
+            self.notion_limiter.acquire()
+            kwargs = {"block_id": block_id, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            try:
+                response = self.notion.blocks.children.list(**kwargs)
+            except APIResponseError as e:
+                if e.code != APIErrorCode.RateLimited or retries >= 5:
+                    raise
+                retries += 1
+                retry_after = float(getattr(e, "headers", {}).get("retry-after", 2 ** retries))
+                time.sleep(retry_after)
+                continue
+            blocks.extend(response.get("results", []))
+            cursor = response.get("next_cursor")
+            if not response.get("has_more") or not cursor:
+                return blocks
+
+    def _fetch_block_trees(self, root_ids):
+        """Fetches the full block trees under root_ids, one tree level at a time.
+
+        Each level's children lists run concurrently (bounded by
+        NOTION_FETCH_CONCURRENCY and the shared rate limiter). Returns
+        ({block_id: children}, ids of roots whose tree could not be fetched).
+        """
+        children = {}
+        failed_roots = set()
+        root_of = {root_id: root_id for root_id in root_ids}
+        level = list(root_ids)
+        with ThreadPoolExecutor(max_workers=NOTION_FETCH_CONCURRENCY) as pool:
+            while level:
+                futures = {block_id: pool.submit(self._list_block_children, block_id) for block_id in level}
+                next_level = []
+                for block_id, future in futures.items():
+                    root_id = root_of[block_id]
+                    try:
+                        children[block_id] = future.result()
+                    except Exception as e:
+                        print(f"Notion API Error for block {block_id}: {e}")
+                        failed_roots.add(root_id)
+                        continue
+                    for block in children[block_id]:
+                        if block.get("has_children") and block["type"] not in NOTION_SKIP_CHILDREN:
+                            root_of[block["id"]] = root_id
+                            next_level.append(block["id"])
+                # Don't keep walking trees that are already incomplete
+                level = [block_id for block_id in next_level if root_of[block_id] not in failed_roots]
+        return children, failed_roots
+
+    def _blocks_to_text(self, blocks, children=None, depth=0):
+        """Flattens blocks (and their fetched children, indented) to markdown-ish text."""
+        children = children or {}
+        indent = "  " * depth
+        content_text = ""
+        for block in blocks:
+            btype = block["type"]
+            text_content = ""
+
+            # Handle different block types
+            if "rich_text" in block.get(btype, {}):
+                text_list = block[btype]["rich_text"]
+                if text_list:
+                    text_content = "".join([t["plain_text"] for t in text_list])
+
+            if btype == "paragraph":
+                content_text += indent + text_content + "\n"
+            elif btype in ["heading_1", "heading_2", "heading_3"]:
+                content_text += f"\n# {text_content}\n"
+            elif btype == "bulleted_list_item":
+                content_text += f"{indent}- {text_content}\n"
+            elif btype == "numbered_list_item":
+                content_text += f"{indent}1. {text_content}\n"
+            elif btype == "code":
+                # Code blocks store text in 'rich_text' inside 'code' object, plus language
+                code_lang = block[btype].get("language", "text")
+                content_text += f"\n```{code_lang}\n{text_content}\n```\n"
+            elif btype == "to_do":
+                checked = "[x]" if block[btype].get("checked") else "[ ]"
+                content_text += f"{indent}{checked} {text_content}\n"
+
+            if block["id"] in children:
+                content_text += self._blocks_to_text(children[block["id"]], children, depth + 1)
+        return content_text
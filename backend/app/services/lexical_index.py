@@ -0,0 +1,195 @@
+# app/services/lexical_index.py
+
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Identifiers like process_payment, PaymentProcessor, PAY-1024 or payment_processor.py
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+(?:[-.][A-Za-z0-9_]+)*")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# Query terms that match everywhere and rank nothing: English glue and code keywords from snippets
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was we were will with
+def class self return if else elif while import const let var function new true false none null
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens that keep whole identifiers and also index their parts.
+
+    `process_payment` yields process_payment, process and payment, so an exact
+    identifier match outscores a match on just one of its words.
+    """
+    tokens = []
+    for raw in TOKEN_PATTERN.findall(text):
+        whole = raw.lower()
+        tokens.append(whole)
+        parts = [p for piece in re.split(r"[-._]", raw) for p in CAMEL_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts)
+    return tokens
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[str]:
+    """Merges ranked ID lists: score(id) = sum of 1 / (k + rank) over the lists it appears in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class BM25Index:
+    """Inverted index with BM25 scoring, held in memory and persisted to SQLite.
+
+    Documents are chunks keyed by their content-hash ID, so an ID that is
+    already indexed never needs re-tokenizing. Each document also gets an
+    integer slot, and a term's postings are scored as NumPy arrays over those
+    slots; the arrays are built on first use and dropped when the term's
+    postings change.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, max_df: float = 0.1):
+        self.k1 = k1
+        self.b = b
+        # Query terms found in more than this share of documents are skipped
+        self.max_df = max_df
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._slots: Dict[str, int] = {}
+        self._slot_ids: List[str] = []
+        self._free_slots: List[int] = []
+        self._slot_lengths = np.zeros(0, dtype=np.float32)
+        # term -> (slots, term frequencies), built lazily from the postings dict
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, doc_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        for doc_id, length in self._conn.execute("SELECT doc_id, length FROM docs"):
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+            self._assign_slot(doc_id, length)
+        for term, doc_id, tf in self._conn.execute("SELECT term, doc_id, tf FROM postings"):
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _assign_slot(self, doc_id: str, length: int):
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_ids[slot] = doc_id
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(doc_id)
+            if slot >= len(self._slot_lengths):
+                self._slot_lengths = np.concatenate(
+                    [self._slot_lengths, np.zeros(max(slot + 1, 1024, len(self._slot_lengths)), dtype=np.float32)]
+                )
+        self._slots[doc_id] = slot
+        self._slot_lengths[slot] = length
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id: str):
+        return doc_id in self._doc_lengths
+
+    def add(self, docs: Iterable[Tuple[str, str]]) -> int:
+        """Indexes (doc_id, text) pairs that aren't indexed yet. Returns how many were added."""
+        doc_rows = []
+        posting_rows = []
+        with self._lock:
+            for doc_id, text in docs:
+                if doc_id in self._doc_lengths:
+                    continue
+                tokens = tokenize(text)
+                self._doc_lengths[doc_id] = len(tokens)
+                self._total_length += len(tokens)
+                self._assign_slot(doc_id, len(tokens))
+                doc_rows.append((doc_id, len(tokens)))
+                for term, tf in Counter(tokens).items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+                    self._arrays.pop(term, None)
+                    posting_rows.append((term, doc_id, tf))
+            if doc_rows:
+                self._conn.executemany("INSERT OR REPLACE INTO docs (doc_id, length) VALUES (?, ?)", doc_rows)
+                self._conn.executemany("INSERT OR REPLACE INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", posting_rows)
+                self._conn.commit()
+        return len(doc_rows)
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        """Drops documents from the index. Returns how many were removed."""
+        removed = 0
+        with self._lock:
+            for doc_id in doc_ids:
+                length = self._doc_lengths.pop(doc_id, None)
+                if length is None:
+                    continue
+                self._total_length -= length
+                for (term,) in self._conn.execute("SELECT term FROM postings WHERE doc_id = ?", (doc_id,)).fetchall():
+                    postings = self._postings.get(term)
+                    self._arrays.pop(term, None)
+                    if postings is not None:
+                        postings.pop(doc_id, None)
+                        if not postings:
+                            del self._postings[term]
+                slot = self._slots.pop(doc_id)
+                self._slot_ids[slot] = None
+                self._slot_lengths[slot] = 0
+                self._free_slots.append(slot)
+                self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+                self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+                removed += 1
+            self._conn.commit()
+        return removed
+
+    def _term_arrays(self, term: str, postings: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            slots = np.fromiter((self._slots[doc_id] for doc_id in postings), dtype=np.int64, count=len(postings))
+            tfs = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            arrays = self._arrays[term] = (slots, tfs)
+        return arrays
+
+    def search(self, query: str, k: int = 15) -> List[Tuple[str, float]]:
+        """Returns the top-k (doc_id, bm25 score) pairs for the query.
+
+        Stopwords are ignored, and so are terms found in more than max_df of
+        the documents (and in over 100): their idf is near zero, but their
+        postings would dominate the cost of the search.
+        """
+        with self._lock:
+            n_docs = len(self._doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            max_postings = max(self.max_df * n_docs, 100)
+            scores = None
+            for term in set(tokenize(query)) - STOPWORDS:
+                postings = self._postings.get(term)
+                if not postings or len(postings) > max_postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                slots, tfs = self._term_arrays(term, postings)
+                norms = self.k1 * (1 - self.b + self.b * self._slot_lengths[slots] / avg_length)
+                if scores is None:
+                    scores = np.zeros(len(self._slot_ids), dtype=np.float32)
+                # A term lists each slot once, so fancy-index += doesn't drop repeats
+                scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + norms)
+            if scores is None:
+                return []
+            matched = np.flatnonzero(scores)
+            if len(matched) > k:
+                matched = matched[np.argpartition(scores[matched], len(matched) - k)[len(matched) - k:]]
+            top = matched[np.argsort(scores[matched])[::-1]]
+            return [(self._slot_ids[slot], float(scores[slot])) for slot in top]
@@ -0,0 +1,145 @@
+# app/services/mention_index.py
+
+import re
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+BACKTICKED = re.compile(r"`([^`\n]{2,80})`")
+FILE_NAME = re.compile(r"\b[\w\-/]*?([A-Za-z_][\w\-]*\.(?:py|ts|tsx|js|jsx|java|go|rb|rs|cs|cpp|c|h|kt|swift|php|sql|yaml|yml|json))\b")
+CAMEL_CASE = re.compile(r"\b[A-Z]?[a-z0-9]+(?:[A-Z][a-z0-9]+)+\b")
+SNAKE_CASE = re.compile(r"\b[A-Za-z][A-Za-z0-9]*(?:_[A-Za-z0-9]+)+\b")
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CLOSED_STATUSES = {"done", "closed", "resolved"}
+
+def extract_identifiers(text: str) -> set:
+    """Code identifiers mentioned in free text, lowercased.
+
+    Picks up `backticked` names (and the identifiers inside them, so
+    `self.gateway.charge()` yields charge), file names like
+    payment_processor.py (plus their stem), and CamelCase / snake_case words.
+    """
+    found = set()
+    for snippet in BACKTICKED.findall(text):
+        found.update(IDENTIFIER.findall(snippet))
+    for file_name in FILE_NAME.findall(text):
+        found.add(file_name)
+        found.add(file_name.rsplit(".", 1)[0])
+    found.update(CAMEL_CASE.findall(text))
+    found.update(SNAKE_CASE.findall(text))
+    return {name.lower() for name in found if len(name) > 2}
+
+def normalize_symbol(symbol: str) -> str:
+    """Editor symbol names can carry signatures, e.g. 'process_payment(amount)'."""
+    return symbol.split("(", 1)[0].strip().lower()
+
+class MentionIndex:
+    """Identifier -> source documents that mention it, built at ingest time.
+
+    Counts are per source document (a Slack message, a Jira issue), not per
+    chunk, and Jira status is kept alongside so open tickets can be counted.
+    Held in memory and persisted to SQLite.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._mentions = {}  # identifier -> {doc_key: source}
+        self._status = {}  # doc_key -> status
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS mentions (identifier TEXT NOT NULL, doc_key TEXT NOT NULL, source TEXT NOT NULL, "
+            "PRIMARY KEY (identifier, doc_key))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS statuses (doc_key TEXT PRIMARY KEY, status TEXT)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_mentions_doc ON mentions (doc_key)")
+        self._conn.commit()
+        for identifier, doc_key, source in self._conn.execute("SELECT identifier, doc_key, source FROM mentions"):
+            self._mentions.setdefault(identifier, {})[doc_key] = source
+        self._status = dict(self._conn.execute("SELECT doc_key, status FROM statuses"))
+        self._chunk_ids = {row[0] for row in self._conn.execute("SELECT chunk_id FROM chunks")}
+
+    def __len__(self):
+        return len(self._chunk_ids)
+
+    def add(self, chunks: Iterable[Tuple[str, str, dict]], document_key) -> int:
+        """Indexes (chunk_id, text, metadata) triples not seen before. Returns how many were added."""
+        mention_rows = []
+        status_rows = []
+        chunk_rows = []
+        with self._lock:
+            for chunk_id, text, metadata in chunks:
+                if chunk_id in self._chunk_ids:
+                    continue
+                metadata = metadata or {}
+                doc_key = document_key(metadata) or chunk_id
+                source = metadata.get("source", "unknown")
+                self._chunk_ids.add(chunk_id)
+                chunk_rows.append((chunk_id,))
+                for identifier in extract_identifiers(text):
+                    self._mentions.setdefault(identifier, {})[doc_key] = source
+                    mention_rows.append((identifier, doc_key, source))
+                if metadata.get("status"):
+                    self._status[doc_key] = metadata["status"]
+                    status_rows.append((doc_key, metadata["status"]))
+            if chunk_rows:
+                self._conn.executemany("INSERT OR IGNORE INTO chunks (chunk_id) VALUES (?)", chunk_rows)
+                self._conn.executemany("INSERT OR REPLACE INTO mentions (identifier, doc_key, source) VALUES (?, ?, ?)", mention_rows)
+                self._conn.executemany("INSERT OR REPLACE INTO statuses (doc_key, status) VALUES (?, ?)", status_rows)
+                self._conn.commit()
+        return len(chunk_rows)
+
+    def remove(self, chunk_ids: Iterable[str], doc_keys: Iterable[str]):
+        """Forgets chunks and every mention and status of these documents.
+
+        Mentions are per document, not per chunk, so a document that still has
+        live chunks must have them added again afterwards.
+        """
+        chunk_ids = list(chunk_ids)
+        doc_keys = list(doc_keys)
+        with self._lock:
+            for doc_key in doc_keys:
+                for (identifier,) in self._conn.execute("SELECT identifier FROM mentions WHERE doc_key = ?", (doc_key,)).fetchall():
+                    docs = self._mentions.get(identifier)
+                    if docs is not None:
+                        docs.pop(doc_key, None)
+                        if not docs:
+                            del self._mentions[identifier]
+                self._status.pop(doc_key, None)
+            self._chunk_ids.difference_update(chunk_ids)
+            self._conn.executemany("DELETE FROM mentions WHERE doc_key = ?", [(k,) for k in doc_keys])
+            self._conn.executemany("DELETE FROM statuses WHERE doc_key = ?", [(k,) for k in doc_keys])
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.commit()
+
+    def set_status(self, doc_key: str, status: str):
+        with self._lock:
+            self._status[doc_key] = status
+            self._conn.execute("INSERT OR REPLACE INTO statuses (doc_key, status) VALUES (?, ?)", (doc_key, status))
+            self._conn.commit()
+
+    def stats(self, symbol: str) -> Optional[dict]:
+        """Slack/Jira mention counts for a symbol, or None if nothing mentions it."""
+        with self._lock:
+            docs = self._mentions.get(normalize_symbol(symbol))
+            if not docs:
+                return None
+            slack_count = 0
+            jira_count = 0
+            open_jira_count = 0
+            for doc_key, source in docs.items():
+                if source == "slack":
+                    slack_count += 1
+                elif source == "jira":
+                    jira_count += 1
+                    status = (self._status.get(doc_key) or "").lower()
+                    if status and status not in CLOSED_STATUSES:
+                        open_jira_count += 1
+        return {
+            "slack_count": slack_count,
+            "jira_count": jira_count,
+            "open_jira_count": open_jira_count
+        }
+
+    def stats_batch(self, symbols: List[str]) -> List[Optional[dict]]:
+        return [self.stats(symbol) if symbol else None for symbol in symbols]
@@ -0,0 +1,356 @@
+# app/services/numpy_store.py
+
+import json
+import math
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Rows are allocated in blocks so the memmap file isn't rewritten on every add
+MIN_CAPACITY = 1024
+
+RANGE_OPS = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+class NumpyVectorStore:
+    """Exact vector search over a float32 matrix, memory-mapped from disk.
+
+    An option for small corpora and filter-heavy workloads, not a speedup
+    over Chroma: an unfiltered query scans every vector, so it is slower
+    than Chroma's HNSW index (about 10x at 50k chunks on one core; see
+    bench_vector_store.py). In exchange, results are exact, filtered queries
+    only scan the matching rows, and a batch of queries (as /context/stats
+    sends) costs a single product. Distances are squared L2, like Chroma's
+    default space, so relevance scores and the calibrated threshold carry over.
+
+    Vectors and their squared norms live in .npy memmaps, so opening the store
+    doesn't read them; ids, texts and metadata live in SQLite, with ids and
+    metadata also held in memory for filtering. Deleted rows are reused.
+
+    It implements the parts of the langchain Chroma wrapper and of the raw
+    Chroma collection that RAGService uses, so it can stand in for either.
+    """
+
+    def __init__(self, path: str, embedding_function: Optional[Embeddings] = None):
+        self.path = path
+        self.embedding_function = embedding_function
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.npy")
+        self._norms_path = os.path.join(path, "norms.npy")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "rows.db"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, chunk_id TEXT UNIQUE NOT NULL, "
+            "document TEXT, metadata TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        # The raw-collection half of the Chroma surface (query, update, count) lives on this class too
+        self._collection = self
+
+        self._vectors = None
+        self._norms = None
+        if os.path.exists(self._vectors_path):
+            self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+            self._norms = np.load(self._norms_path, mmap_mode="r+")
+        capacity = len(self._vectors) if self._vectors is not None else 0
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._metadatas: List[Optional[dict]] = [None] * capacity
+        self._rows: Dict[str, int] = {}
+        # Metadata key -> per-row values, built on first filter and dropped on any write
+        self._columns: Dict[tuple, np.ndarray] = {}
+        # Bumped on every write, so a search computed outside the lock can tell it went stale
+        self._version = 0
+        for row, chunk_id, metadata in self._conn.execute("SELECT row, chunk_id, metadata FROM rows"):
+            self._alive[row] = True
+            self._ids[row] = chunk_id
+            self._metadatas[row] = json.loads(metadata)
+            self._rows[chunk_id] = row
+        self._size = max(self._rows.values()) + 1 if self._rows else 0
+        self._free = [row for row in range(self._size) if not self._alive[row]]
+
+    # --- storage ---
+
+    def _ensure_capacity(self, needed: int, dim: int):
+        capacity = len(self._alive)
+        if self._vectors is not None and needed <= capacity:
+            return
+        if self._vectors is not None and self._vectors.shape[1] != dim:
+            raise ValueError(f"Vector size {dim} does not match the store's {self._vectors.shape[1]}")
+        new_capacity = max(needed, capacity * 2, MIN_CAPACITY)
+        vectors = np.lib.format.open_memmap(self._vectors_path + ".tmp", mode="w+", dtype=np.float32, shape=(new_capacity, dim))
+        norms = np.lib.format.open_memmap(self._norms_path + ".tmp", mode="w+", dtype=np.float32, shape=(new_capacity,))
+        if self._vectors is not None:
+            vectors[:capacity] = self._vectors
+            norms[:capacity] = self._norms
+        vectors.flush()
+        norms.flush()
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        os.replace(self._norms_path + ".tmp", self._norms_path)
+        # Searches holding the old maps keep reading them; the files they map stay valid until released
+        self._vectors = vectors
+        self._norms = norms
+        self._alive = np.concatenate([self._alive, np.zeros(new_capacity - capacity, dtype=bool)])
+        self._ids.extend([None] * (new_capacity - capacity))
+        self._metadatas.extend([None] * (new_capacity - capacity))
+
+    def add(self, ids: List[str], embeddings, documents: List[str] = None, metadatas: List[dict] = None):
+        """Adds or overwrites rows by id."""
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        documents = documents or [None] * len(ids)
+        metadatas = [dict(meta or {}) for meta in (metadatas or [None] * len(ids))]
+        with self._lock:
+            new = len([chunk_id for chunk_id in dict.fromkeys(ids) if chunk_id not in self._rows])
+            self._ensure_capacity(self._size + max(new - len(self._free), 0), vectors.shape[1])
+            rows = []
+            for chunk_id in ids:
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    row = self._free.pop() if self._free else self._size
+                    self._size = max(self._size, row + 1)
+                    self._rows[chunk_id] = row
+                rows.append(row)
+            self._vectors[rows] = vectors
+            self._norms[rows] = np.einsum("ij,ij->i", vectors, vectors)
+            self._vectors.flush()
+            self._norms.flush()
+            # Rows only count once SQLite has them, so a crash mid-add leaves no half-written row
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rows (row, chunk_id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(row, chunk_id, text, json.dumps(meta)) for row, chunk_id, text, meta in zip(rows, ids, documents, metadatas)]
+            )
+            self._conn.commit()
+            for row, chunk_id, meta in zip(rows, ids, metadatas):
+                self._ids[row] = chunk_id
+                self._metadatas[row] = meta
+                self._alive[row] = True
+            self._columns = {}
+            self._version += 1
+
+    def update(self, ids: List[str], metadatas: List[dict] = None, embeddings=None, documents: List[str] = None):
+        """Raw-collection update: metadata keys are merged into what is stored, as Chroma does."""
+        with self._lock:
+            known = [(i, self._rows[chunk_id]) for i, chunk_id in enumerate(ids) if chunk_id in self._rows]
+            if embeddings is not None:
+                vectors = np.asarray(embeddings, dtype=np.float32)[[i for i, _ in known]]
+                rows = [row for _, row in known]
+                self._vectors[rows] = vectors
+                self._norms[rows] = np.einsum("ij,ij->i", vectors, vectors)
+                self._vectors.flush()
+                self._norms.flush()
+            for i, row in known:
+                if metadatas is not None:
+                    self._metadatas[row] = {**self._metadatas[row], **(metadatas[i] or {})}
+                    self._conn.execute("UPDATE rows SET metadata = ? WHERE row = ?", (json.dumps(self._metadatas[row]), row))
+                if documents is not None:
+                    self._conn.execute("UPDATE rows SET document = ? WHERE row = ?", (documents[i], row))
+            self._conn.commit()
+            self._columns = {}
+            self._version += 1
+
+    def delete(self, ids: List[str] = None):
+        with self._lock:
+            rows = [self._rows.pop(chunk_id) for chunk_id in dict.fromkeys(ids or []) if chunk_id in self._rows]
+            for row in rows:
+                self._alive[row] = False
+                self._ids[row] = None
+                self._metadatas[row] = None
+            self._free.extend(rows)
+            self._conn.executemany("DELETE FROM rows WHERE row = ?", [(row,) for row in rows])
+            self._conn.commit()
+            self._columns = {}
+            self._version += 1
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    # --- langchain wrapper surface ---
+
+    def add_documents(self, documents: List[Document], ids: List[str] = None):
+        texts = [doc.page_content for doc in documents]
+        ids = ids or [doc.id for doc in documents]
+        self.add(ids, self.embedding_function.embed_documents(texts), texts, [doc.metadata for doc in documents])
+        return ids
+
+    def update_documents(self, ids: List[str], documents: List[Document]):
+        """Rewrites text, vector and metadata of existing rows."""
+        texts = [doc.page_content for doc in documents]
+        self.add(ids, self.embedding_function.embed_documents(texts), texts, [doc.metadata for doc in documents])
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4, filter: dict = None):
+        """(Document, squared L2 distance) pairs, nearest first; like the Chroma wrapper, despite the name."""
+        result = self.query([embedding], n_results=k, where=filter, include=["documents", "metadatas", "distances"])
+        return [
+            (Document(page_content=text or "", metadata=meta, id=chunk_id), distance)
+            for chunk_id, text, meta, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+
+    @staticmethod
+    def _euclidean_relevance_score_fn(distance: float) -> float:
+        # Same mapping as langchain's, so thresholds calibrated on Chroma still apply
+        return 1.0 - distance / math.sqrt(2)
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    # --- reads ---
+
+    def _documents(self, rows: List[int]) -> Dict[int, str]:
+        found = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._conn.execute(f"SELECT row, document FROM rows WHERE row IN ({placeholders})", batch))
+        return found
+
+    def _mask(self, size: int, where: dict = None, ids: Iterable[str] = None) -> np.ndarray:
+        """Alive rows below size, narrowed to the where clause and/or ids."""
+        mask = self._alive[:size].copy()
+        if ids is not None:
+            allowed = np.zeros(size, dtype=bool)
+            allowed[[row for row in (self._rows.get(chunk_id) for chunk_id in ids) if row is not None and row < size]] = True
+            mask &= allowed
+        if where:
+            mask &= self._where_mask(where)[:size]
+        return mask
+
+    def _column(self, key: str, numeric: bool = False) -> np.ndarray:
+        """One metadata field across all rows: objects (None if missing), or floats (NaN if missing)."""
+        column = self._columns.get((key, numeric))
+        if column is None:
+            values = [meta.get(key) if meta else None for meta in self._metadatas]
+            if numeric:
+                column = np.array([v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan for v in values],
+                                  dtype=np.float64)
+            else:
+                column = np.empty(len(values), dtype=object)
+                column[:] = values
+            self._columns[(key, numeric)] = column
+        return column
+
+    def _where_mask(self, where: dict) -> np.ndarray:
+        """Evaluates a Chroma where clause ($and/$or, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte) over all rows at once."""
+        mask = np.ones(len(self._metadatas), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+            elif key == "$or":
+                matched = np.zeros(len(mask), dtype=bool)
+                for clause in condition:
+                    matched |= self._where_mask(clause)
+                mask &= matched
+            else:
+                for op, operand in (condition.items() if isinstance(condition, dict) else [("$eq", condition)]):
+                    mask &= self._compare(key, op, operand)
+        return mask
+
+    def _compare(self, key: str, op: str, operand) -> np.ndarray:
+        if op in RANGE_OPS:
+            # NaN (missing or non-numeric) never matches a range, as in Chroma
+            return RANGE_OPS[op](self._column(key, numeric=True), operand)
+        column = self._column(key)
+        if op == "$eq":
+            return column == operand
+        if op == "$ne":
+            return column != operand
+        if op in ("$in", "$nin"):
+            matched = np.zeros(len(column), dtype=bool)
+            for value in operand:
+                matched |= column == value
+            return matched if op == "$in" else ~matched
+        raise ValueError(f"Unsupported where operator: {op}")
+
+    def _rows_result(self, rows: List[int], include: List[str]) -> dict:
+        with self._lock:
+            documents = self._documents(rows) if "documents" in include else {}
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [documents.get(row) for row in rows] if "documents" in include else None,
+                "metadatas": [dict(self._metadatas[row]) for row in rows] if "metadatas" in include else None,
+                "embeddings": np.array(self._vectors[rows]) if "embeddings" in include and rows else
+                ([] if "embeddings" in include else None),
+                "include": include
+            }
+
+    def get(self, ids: List[str] = None, where: dict = None, limit: int = None, offset: int = None,
+            include: List[str] = None) -> dict:
+        """Rows by id and/or where clause, in storage order; the same shape Chroma returns."""
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            rows = np.flatnonzero(self._mask(self._size, where, ids)).tolist()[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            return self._rows_result(rows, include)
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None, ids: List[str] = None,
+              include: List[str] = None) -> dict:
+        """Exact top-n for each query by squared L2, one matrix product for the whole batch."""
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        # The product runs outside the lock so writers aren't held up by searches
+        with self._lock:
+            version = self._version
+            state = (self._size, self._vectors, self._norms, self._mask(self._size, where, ids))
+        top = self._top_k(queries, n_results, where is not None or ids is not None, *state)
+
+        result = {"ids": [], "distances": [], "documents": [], "metadatas": [], "include": include}
+        with self._lock:
+            if self._version != version:
+                # A write landed meanwhile and rows may have been freed or reused; search again, consistently
+                top = self._top_k(queries, n_results, where is not None or ids is not None,
+                                  self._size, self._vectors, self._norms, self._mask(self._size, where, ids))
+            for rows, distances in top:
+                fetched = self._rows_result(rows, [name for name in include if name != "distances"])
+                result["ids"].append(fetched["ids"])
+                result["distances"].append(distances)
+                result["documents"].append(fetched["documents"] or [])
+                result["metadatas"].append(fetched["metadatas"] or [])
+        return result
+
+    @staticmethod
+    def _top_k(queries: np.ndarray, n_results: int, filtered: bool, size: int, vectors, norms, mask: np.ndarray) -> list:
+        """(rows, distances) per query, nearest first, over the rows the mask allows."""
+        allowed = np.flatnonzero(mask) if filtered else None
+        n = min(n_results, len(allowed) if filtered else int(mask.sum()))
+        if n == 0:
+            return [([], []) for _ in queries]
+
+        # ||q - x||^2 = ||x||^2 - 2 q.x + ||q||^2; a filter narrows the product to its rows
+        if filtered:
+            matrix, matrix_norms = vectors[allowed], norms[allowed]
+        else:
+            matrix, matrix_norms = vectors[:size], norms[:size]
+        distances = queries @ matrix.T
+        distances *= -2.0
+        distances += matrix_norms[None, :]
+        distances += np.einsum("ij,ij->i", queries, queries)[:, None]
+        if not filtered and not mask.all():
+            # Deleted rows waiting to be reused
+            distances[:, ~mask] = np.inf
+        top = np.argpartition(distances, n - 1, axis=1)[:, :n]
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_distances = np.maximum(np.take_along_axis(top_distances, order, axis=1), 0.0)
+        return [
+            ((allowed[rows] if filtered else rows).tolist(), row_distances.tolist())
+            for rows, row_distances in zip(top, top_distances)
+        ]
+
+    def get_stats(self) -> dict:
+        return {
+            "backend": "numpy",
+            "chunks": len(self._rows),
+            "capacity": len(self._alive),
+            "free_rows": len(self._free),
+            "dimensions": int(self._vectors.shape[1]) if self._vectors is not None else 0
+        }
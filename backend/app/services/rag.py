@@ -2,82 +2,430 @@
 
 import os
 import re
+import json
+import time
+import textwrap
 from functools import lru_cache
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain_chroma import Chroma
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
-from app.models import ContextObject
+from app.models import ChunkDetail, ContextCard, ExplainResponse
+from app.services.embedding_cache import CachedEmbeddings, QueryEmbeddingCache, content_hash
+from app.services.executors import get_executor
+from app.services.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.services.mention_index import MentionIndex
+from app.services.explain_cache import ExplainCache
+from app.services.single_flight import SingleFlight
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.context_packer import ContextPacker, merge_chunks
+from app.services.summarizer import SummaryStore, summarize_batch
+from app.services.document_registry import DocumentRegistry
+from app.services.numpy_store import NumpyVectorStore
+from app.services.data_processing import document_key, metadata_where
 from typing import List
 
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+LLM_MODEL = "gemini-3-pro-preview"
+# Bump whenever the explain prompt changes so cached answers from the old prompt are not reused
+EXPLAIN_PROMPT_VERSION = "explain-v2"
+# Calculate absolute path to backend root
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Card previews are one line; the full text is fetched only when a card is opened
+PREVIEW_CHARS = 120
+
+def _use_fake_models() -> bool:
+    """CONTEXTSYNC_FAKE_MODELS=1 swaps Gemini for local fakes (tests, stream framing checks)."""
+    return os.environ.get("CONTEXTSYNC_FAKE_MODELS", "").lower() in ("1", "true", "yes")
+
+def _fake_llm():
+    from langchain_core.language_models import FakeListChatModel
+    return FakeListChatModel(
+        responses=[os.environ.get(
+            "FAKE_LLM_RESPONSE",
+            "## ⚡ Context Analysis\n* **Relevance**: Low - answered by the local fake LLM.\n"
+        )],
+        sleep=float(os.environ.get("FAKE_LLM_TOKEN_DELAY", "0.01"))
+    )
+
 class RAGService:
     def __init__(self):
+        # Identical concurrent requests share one retrieval / stats query / generation
+        self._flights = {name: SingleFlight() for name in ("retrieve", "stats", "explain")}
+        # Calibrate with calibrate_threshold.py; relevance is 0-1, higher is closer
+        self.relevance_threshold = float(os.environ.get("RELEVANCE_THRESHOLD", "0.3"))
+        self.relevance_score_gap = float(os.environ.get("RELEVANCE_SCORE_GAP", "0"))
         self._init_resources()
     
     @lru_cache(maxsize=1)
     def _get_embeddings(self):
-        return GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+        # Unchanged chunks are served from the on-disk cache instead of the embedding API
+        if _use_fake_models():
+            from langchain_core.embeddings import DeterministicFakeEmbedding
+            embeddings, model_name, task_type = DeterministicFakeEmbedding(size=768), "fake", None
+        else:
+            embeddings, model_name, task_type = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL, "RETRIEVAL_QUERY"
+        return CachedEmbeddings(
+            embeddings,
+            model_name=model_name,
+            db_path=os.environ.get("EMBEDDING_CACHE_PATH", os.path.join(BACKEND_ROOT, "embedding_cache.db")),
+            max_entries=int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "100000")),
+            query_cache=QueryEmbeddingCache(
+                max_bytes=int(os.environ.get("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+                ttl_seconds=float(os.environ.get("QUERY_CACHE_TTL_SECONDS", "3600"))
+            ),
+            query_task_type=task_type
+        )
+
+    @lru_cache(maxsize=1)
+    def _get_embedding_batcher(self):
+        # Query embeddings from concurrent requests share one embed_documents call
+        return EmbeddingBatcher(
+            self._get_embeddings(),
+            window_ms=float(os.environ.get("EMBED_BATCH_WINDOW_MS", "5")),
+            max_batch_size=int(os.environ.get("EMBED_BATCH_MAX_SIZE", "64"))
+        )
+
+    @lru_cache(maxsize=1)
+    def _get_context_packer(self):
+        return ContextPacker(budget_tokens=int(os.environ.get("EXPLAIN_CONTEXT_TOKEN_BUDGET", "3000")))
 
     def _init_resources(self):
         """Initialize ChromaDB and LLM."""
-        # Calculate absolute path to backend root
-        current_dir = os.path.dirname(os.path.abspath(__file__)) # app/services
-        backend_root = os.path.dirname(os.path.dirname(current_dir)) # backend
-        db_path = os.path.join(backend_root, "chroma_db")
+        db_path = os.environ.get("CHROMA_DB_PATH", os.path.join(BACKEND_ROOT, "chroma_db"))
+        self.vector_backend = os.environ.get("VECTOR_BACKEND", "chroma").lower()
         
         try:
-            self.db = Chroma(
-                persist_directory=db_path, 
-                embedding_function=self._get_embeddings()
-            )
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-3-pro-preview",
-                temperature=0.2,
-                convert_system_message_to_human=True
-            )
+            if self.vector_backend == "numpy":
+                # Exact search over a memory-mapped matrix; same surface as the Chroma wrapper
+                self.db = NumpyVectorStore(
+                    os.environ.get("NUMPY_STORE_PATH", os.path.join(BACKEND_ROOT, "numpy_store")),
+                    embedding_function=self._get_embeddings()
+                )
+                if self.db.count() == 0 and os.path.isdir(db_path):
+                    self._import_from_chroma(db_path)
+            else:
+                self.db = Chroma(
+                    persist_directory=db_path, 
+                    embedding_function=self._get_embeddings()
+                )
+            if _use_fake_models():
+                self.llm = _fake_llm()
+                self.summary_llm = self.llm
+            else:
+                self.llm = ChatGoogleGenerativeAI(
+                    model=LLM_MODEL,
+                    temperature=0.2,
+                    convert_system_message_to_human=True
+                )
+                # Background summaries don't need the explain model; a cheaper one can be configured
+                self.summary_llm = ChatGoogleGenerativeAI(
+                    model=os.environ.get("SUMMARY_LLM_MODEL", LLM_MODEL),
+                    temperature=0.0,
+                    convert_system_message_to_human=True
+                )
+            self._init_lexical_index()
+            # Loading the tokenizer can mean a download; do it at startup, not inside the first /explain
+            self._get_context_packer()
             print("RAG Service Initialized.")
         except Exception as e:
             print(f"Failed to initialize RAG Service: {e}")
             self.db = None
             self.llm = None
+            self.summary_llm = None
+
+    def _import_from_chroma(self, db_path: str, batch_size: int = 1000):
+        """Copies an existing Chroma collection into an empty NumPy store, stored vectors included."""
+        collection = Chroma(persist_directory=db_path)._collection
+        total = collection.count()
+        if not total:
+            return
+        print(f"Importing {total} chunks from Chroma at {db_path} into the NumPy store...")
+        offset = 0
+        while True:
+            batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            self.db.add(batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"])
+            offset += len(batch["ids"])
+        print(f"Imported {offset} chunks.")
+
+    def _init_lexical_index(self):
+        """Opens the side indexes and stores, and backfills any chunks they haven't seen yet."""
+        self.lexical_index = BM25Index(
+            os.environ.get("LEXICAL_INDEX_PATH", os.path.join(BACKEND_ROOT, "lexical_index.db"))
+        )
+        self.mention_index = MentionIndex(
+            os.environ.get("MENTION_INDEX_PATH", os.path.join(BACKEND_ROOT, "mention_index.db"))
+        )
+        self.explain_cache = ExplainCache(
+            os.environ.get("EXPLAIN_CACHE_PATH", os.path.join(BACKEND_ROOT, "explain_cache.db")),
+            max_entries=int(os.environ.get("EXPLAIN_CACHE_MAX_ENTRIES", "5000"))
+        )
+        self.summary_store = SummaryStore(
+            os.environ.get("SUMMARY_STORE_PATH", os.path.join(BACKEND_ROOT, "summaries.db"))
+        )
+        self.registry = DocumentRegistry(
+            os.environ.get("DOCUMENT_REGISTRY_PATH", os.path.join(BACKEND_ROOT, "document_registry.db"))
+        )
+        self._compacted_vectors = 0
+        self._compacted_bytes = 0
+        self._lexical_searches = 0
+        self._lexical_seconds = 0.0
+        self._summary_llm_calls = 0
+        self._summary_llm_failures = 0
+
+        collection = self.db._collection
+        count = collection.count()
+        if (count <= len(self.lexical_index) and count <= len(self.mention_index)
+                and count <= len(self.summary_store) and count <= len(self.registry)):
+            return
+        print("Backfilling lexical/mention indexes, the document registry and the summary queue from the vector store...")
+        offset = 0
+        while True:
+            batch = collection.get(include=["documents", "metadatas"], limit=1000, offset=offset)
+            if not batch["ids"]:
+                break
+            self._index_chunks(batch["ids"], batch["documents"], batch["metadatas"])
+            self.registry.register(
+                (self._doc_key(doc_id, meta), doc_id) for doc_id, meta in zip(batch["ids"], batch["metadatas"])
+            )
+            self.summary_store.enqueue(
+                doc_id for doc_id, meta in zip(batch["ids"], batch["metadatas"]) if not (meta or {}).get("summary")
+            )
+            offset += len(batch["ids"])
+
+    @staticmethod
+    def _doc_key(chunk_id: str, metadata: dict) -> str:
+        """Registry key of a chunk's source document; chunks without one stand alone."""
+        return document_key(metadata or {}) or chunk_id
+
+    def _index_chunks(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        """Adds chunks to the side indexes that are maintained alongside the vector store."""
+        self.lexical_index.add(zip(ids, texts))
+        self.mention_index.add(zip(ids, texts, metadatas), document_key)
+        self.summary_store.enqueue(ids)
+
+    def _attach_summaries(self, ids: List[str], docs: List[Document]):
+        """Copies already-known summaries into chunk metadata before it is written."""
+        known = self.summary_store.get_many(ids)
+        for doc_id, doc in zip(ids, docs):
+            if doc_id in known:
+                doc.metadata["summary"] = known[doc_id]
+
+    async def summarize_pending(self, batch_size: int = 20) -> int:
+        """Summarizes one batch of queued chunks with a single LLM call.
+
+        Summaries go to the summary store and into each chunk's "summary"
+        metadata. Returns how many chunks were taken off the queue (0 when
+        the queue is empty), so callers can loop until it drains.
+        """
+        if not self.db or not self.summary_llm:
+            return 0
+        ingest = get_executor("ingest")
+        ids = await ingest.run(self.summary_store.next_pending, batch_size)
+        if not ids:
+            return 0
+        fetched = await ingest.run(self.db.get, ids=ids, include=["documents"])
+        gone = set(ids) - set(fetched["ids"])
+        if gone:
+            await ingest.run(self.summary_store.discard, list(gone))
+        if not fetched["ids"]:
+            return len(gone)
+
+        try:
+            self._summary_llm_calls += 1
+            parsed = await summarize_batch(self.summary_llm, fetched["documents"])
+        except Exception as e:
+            self._summary_llm_failures += 1
+            print(f"Error summarizing chunks: {e}")
+            await ingest.run(self.summary_store.failed, fetched["ids"])
+            return len(gone)
+
+        summaries = {fetched["ids"][index]: summary for index, summary in parsed.items()}
+        skipped = [doc_id for doc_id in fetched["ids"] if doc_id not in summaries]
+        if summaries:
+            # Chroma merges metadata on update, so this only adds the summary key
+            await ingest.run(
+                self.db._collection.update,
+                ids=list(summaries),
+                metadatas=[{"summary": summary} for summary in summaries.values()]
+            )
+            await ingest.run(self.summary_store.put, summaries)
+        if skipped:
+            await ingest.run(self.summary_store.failed, skipped)
+        return len(gone) + len(summaries) + len(skipped)
 
     def _extract_keywords(self, code_snippet: str) -> str:
         """Extracts potential keywords (function names, variables) from code."""
         # Simple regex to find words that look like identifiers
         identifiers = re.findall(r'[a-zA-Z_][a-zA-Z0-9_]*', code_snippet)
-        # Filter out common keywords could be added here, but for now just unique them
-        unique_identifiers = list(set(identifiers))
+        # Filter out common keywords could be added here, but for now just unique them.
+        # dict.fromkeys keeps first-seen order, so the query is identical across processes.
+        unique_identifiers = list(dict.fromkeys(identifiers))
         return " ".join(unique_identifiers[:10]) # Limit to top 10 to avoid noise
 
-    def retrieve(self, query: str, k: int = 15):
-        """Hybrid-ish retrieval: simply uses the vector store for now."""
-        # In a real hybrid setup, we might combine BM25 with Vector search.
-        # For this MVP, we rely on the semantic power of the embedding model,
-        # but we augment the query with extracted code keywords to ensure specificity.
+    def _normalize_snippet(self, code_snippet: str) -> str:
+        """Normalizes indentation, line endings and trailing whitespace."""
+        lines = code_snippet.replace("\r\n", "\n").split("\n")
+        return textwrap.dedent("\n".join(line.rstrip() for line in lines)).strip("\n")
+
+    def _build_search_query(self, code_snippet: str) -> str:
+        """Normalizes a snippet and augments it with keywords.
+
+        The same function always maps to the same query (and query-cache entry).
+        """
+        normalized = self._normalize_snippet(code_snippet)
+        keywords = self._extract_keywords(normalized)
+        return f"{normalized}\nKeywords: {keywords}"
+
+    def _lexical_search(self, query: str, k: int) -> List[str]:
+        start = time.perf_counter()
+        hits = self.lexical_index.search(query, k=k)
+        self._lexical_seconds += time.perf_counter() - start
+        self._lexical_searches += 1
+        # Superseded chunks are already gone from the vector store but stay in BM25 until compaction
+        return [doc_id for doc_id, _ in hits if not self.registry.is_tombstoned(doc_id)]
+
+    def _relevance_fn(self):
+        """Maps Chroma distances to relevance (higher is better) for the collection's distance space."""
+        try:
+            return self.db._select_relevance_score_fn()
+        except ValueError:
+            # No space configured on the collection means Chroma's default, l2
+            return self.db._euclidean_relevance_score_fn
+
+    def _cut_by_relevance(self, scored: list) -> list:
+        """Drops (item, score) pairs below the relevance threshold or after a large score gap.
+
+        Order is preserved. The gap cut keeps everything scoring at least as well
+        as the hit just above the first drop larger than RELEVANCE_SCORE_GAP.
+        """
+        kept = [(item, score) for item, score in scored if score >= self.relevance_threshold]
+        if self.relevance_score_gap > 0 and len(kept) > 1:
+            ordered = sorted((score for _, score in kept), reverse=True)
+            floor = ordered[-1]
+            for higher, lower in zip(ordered, ordered[1:]):
+                if higher - lower > self.relevance_score_gap:
+                    floor = higher
+                    break
+            kept = [(item, score) for item, score in kept if score >= floor]
+        return kept
+
+    def retrieve_scored(self, query: str, k: int = 15, query_vector: List[float] = None, where: dict = None):
+        """Hybrid retrieval: vector search fused with BM25 via reciprocal rank fusion.
+
+        Returns (doc, relevance) pairs in fused order, cut at the relevance
+        threshold / score gap, so fewer than k come back when matches are weak.
+        Pass query_vector when the query has already been embedded (e.g. by the batcher).
+        where is a Chroma metadata filter (see data_processing.metadata_where); it
+        is applied inside the vector search, and BM25 hits outside it are dropped.
+        """
+        # The embedding model carries the semantics (and the query is augmented with
+        # extracted code keywords), while BM25 catches exact identifiers such as
+        # process_payment or PAY-1024 that embeddings tend to blur.
         if not self.db:
             return []
-        return self.db.similarity_search(query, k=k)
+        if query_vector is None:
+            query_vector = self._get_embeddings().embed_query(query)
+        relevance = self._relevance_fn()
+        # Despite the name, this returns raw distances
+        vector_hits = self.db.similarity_search_by_vector_with_relevance_scores(query_vector, k=k, filter=where)
+        lexical_ids = self._lexical_search(query, k)
 
-    async def explain_code(self, code_snippet: str, file_path: str, line_numbers: str) -> str:
-        if not self.db or not self.llm:
-            return "### Error\nContext Engine is not initialized. Please check server logs."
+        # Chunk IDs are content hashes, so vector hits can be matched up without a lookup
+        docs_by_id = {}
+        scores = {}
+        for doc, distance in vector_hits:
+            doc_id = content_hash(doc.page_content)
+            docs_by_id[doc_id] = doc
+            scores[doc_id] = relevance(distance)
+        fused_ids = reciprocal_rank_fusion([list(docs_by_id), lexical_ids])
+        if where is None:
+            fused_ids = fused_ids[:k]
 
-        # 1. Augment Query
-        keywords = self._extract_keywords(code_snippet)
-        search_query = f"{code_snippet}\nKeywords: {keywords}"
-        
-        # 2. Retrieve Context
-        print(f"Retrieving context for: {search_query[:50]}...")
-        docs = self.retrieve(search_query)
-        
-        context_str = "\n\n".join([
-            f"--- SOURCE: {doc.metadata.get('source', 'unknown')} ---\n"
-            f"{doc.page_content}" 
-            for doc in docs
-        ])
+        missing = [doc_id for doc_id in fused_ids if doc_id not in docs_by_id]
+        if missing:
+            # Lexical-only hits are scored against the same query vector, so every score is comparable.
+            # BM25 knows nothing about metadata, so the filter drops its hits that don't match
+            fetched = self.db._collection.query(
+                query_embeddings=[query_vector],
+                ids=missing,
+                where=where,
+                n_results=len(missing),
+                include=["documents", "metadatas", "distances"]
+            )
+            for doc_id, text, meta, distance in zip(
+                fetched["ids"][0], fetched["documents"][0], fetched["metadatas"][0], fetched["distances"][0]
+            ):
+                docs_by_id[doc_id] = Document(page_content=text, metadata=meta or {}, id=doc_id)
+                scores[doc_id] = relevance(distance)
+        scored = [(docs_by_id[doc_id], scores[doc_id]) for doc_id in fused_ids if doc_id in docs_by_id][:k]
+        return self._cut_by_relevance(scored)
+
+    def retrieve(self, query: str, k: int = 15, query_vector: List[float] = None, where: dict = None) -> List[Document]:
+        """retrieve_scored without the scores."""
+        return [doc for doc, _ in self.retrieve_scored(query, k, query_vector, where)]
+
+    async def _retrieve_shared(self, query: str, k: int = 15, where: dict = None):
+        """retrieve_scored() on the retrieval pool, shared by concurrent callers with the same query and filter."""
+        if not self.db:
+            return []
+
+        async def run():
+            query_vector = await self._get_embedding_batcher().embed(query)
+            return await get_executor("retrieval").run(self.retrieve_scored, query, k, query_vector, where)
+
+        return await self._flights["retrieve"].do((query, k, self._where_key(where)), run)
+
+    @staticmethod
+    def _where_key(where: dict):
+        """Hashable form of a where clause, for single-flight keys."""
+        return json.dumps(where, sort_keys=True) if where else None
+
+    def get_metrics(self) -> dict:
+        """Cache counters, used to check that repeat CodeLens refreshes skip the embedding API."""
+        embeddings = self._get_embeddings()
+        return {
+            "embedding_cache": embeddings.get_stats(),
+            "query_cache": embeddings.query_cache.get_stats(),
+            "embedding_batcher": self._get_embedding_batcher().get_stats(),
+            "context_packer": self._get_context_packer().get_stats(),
+            "vector_store": {
+                "backend": self.vector_backend,
+                "chunks": self.db._collection.count()
+            } if self.db else {},
+            "explain_cache": self.explain_cache.get_stats() if self.db else {},
+            "document_registry": {
+                **self.registry.get_stats(),
+                "compacted_vectors": self._compacted_vectors,
+                "compacted_bytes": self._compacted_bytes
+            } if self.db else {},
+            "summaries": {
+                **self.summary_store.get_stats(),
+                "llm_calls": self._summary_llm_calls,
+                "llm_failures": self._summary_llm_failures
+            } if self.db else {},
+            "single_flight": {name: flight.get_stats() for name, flight in self._flights.items()},
+            "mention_index": {
+                "chunks": len(self.mention_index) if self.db else 0
+            },
+            "lexical_index": {
+                "documents": len(self.lexical_index) if self.db else 0,
+                "searches": self._lexical_searches if self.db else 0,
+                "avg_search_ms": round(self._lexical_seconds / self._lexical_searches * 1000, 3)
+                if self.db and self._lexical_searches else 0.0
+            }
+        }
+
+    def _explain_chain(self, code_snippet: str, file_path: str, line_numbers: str, scored):
+        """Builds the explain chain, its inputs and the context packing report for retrieved (doc, score) pairs."""
+        # Merged, de-duplicated and cut to the token budget, most relevant first
+        context_str, packing = self._get_context_packer().pack(
+            [doc for doc, _ in scored], [score for _, score in scored]
+        )
 
-        # 3. Construct Prompt
         system_prompt = """You are ContextSync, an AI assistant that bridges the gap between Code and Context (Slack/Jira).
 
         ### 🧠 Reasoning Loop
@@ -110,54 +458,163 @@ class RAGService:
 
         user_input_str = f"Context:\n{context_str}\n\nCode ({file_path}:{line_numbers}):\n```python\n{code_snippet}\n```"
 
-        # 4. Generate
         chain = prompt | self.llm | StrOutputParser()
-        response = await chain.ainvoke({
-            "user_input": user_input_str
-        })
-        return response
+        return chain, {"user_input": user_input_str}, packing
 
-    async def _summarize_doc(self, content: str) -> str:
-        """Summarizes a single document using the LLM."""
-        # prompt_text = f"Summarize this context in one concise sentence for a developer:\n\n{content}"
-        # summary = await self.llm.ainvoke(prompt_text)
-        # return f"**Summary**: {summary.content}\n\n**Raw Source**:\n{content}"
-        return f"**Snippet**: {content[:300]}...\n\n**Raw Source**:\n{content}"
-
-    async def get_context_objects(self, code_snippet: str) -> List[ContextObject]:
-        """Retrieves structured context objects with LLM summaries."""
-        keywords = self._extract_keywords(code_snippet)
-        search_query = f"{code_snippet}\nKeywords: {keywords}"
-        docs = self.retrieve(search_query)
-        
-        import asyncio
-        
-        # Summarize in parallel
-        summary_tasks = [self._summarize_doc(doc.page_content) for doc in docs]
-        summaries = await asyncio.gather(*summary_tasks)
-        
-        objects = []
-        for doc, summary in zip(docs, summaries):
-            # Map Chroma metadata to ContextObject
-            source = doc.metadata.get("source", "unknown")
-            title_or_user = doc.metadata.get("user") or doc.metadata.get("title") or doc.metadata.get("id") or "Unknown"
-            
-            obj = ContextObject(
-                source=source,
-                title_or_user=title_or_user,
-                url=doc.metadata.get("url"), 
-                content_summary=summary,
-                relevance_score=0.0, # Placeholder, would need vector score
-                related_code_files=[]
+    async def _retrieve_for_explain(self, code_snippet: str, filters=None):
+        """Retrieves context for a snippet and computes its explain-cache key."""
+        search_query = self._build_search_query(code_snippet)
+        print(f"Retrieving context for: {search_query[:50]}...")
+        scored = await self._retrieve_shared(search_query, where=metadata_where(filters))
+
+        # Same snippet + same retrieved chunks + same prompt/model -> same answer
+        chunk_ids = [content_hash(doc.page_content) for doc, _ in scored]
+        cache_key = ExplainCache.make_key(
+            self._normalize_snippet(code_snippet), chunk_ids,
+            f"{EXPLAIN_PROMPT_VERSION}:{LLM_MODEL}:{self._get_context_packer().budget_tokens}"
+        )
+        return scored, chunk_ids, cache_key
+
+    async def explain_code(self, code_snippet: str, file_path: str, line_numbers: str, filters=None) -> ExplainResponse:
+        if not self.db or not self.llm:
+            return ExplainResponse(markdown="### Error\nContext Engine is not initialized. Please check server logs.")
+
+        scored, chunk_ids, cache_key = await self._retrieve_for_explain(code_snippet, filters)
+        # SQLite reads and writes, kept off the event loop like the other side stores
+        cached = await get_executor("retrieval").run(self.explain_cache.get, cache_key)
+        if cached is not None:
+            return ExplainResponse(markdown=cached, cached=True)
+
+        async def generate():
+            chain, inputs, packing = self._explain_chain(code_snippet, file_path, line_numbers, scored)
+            response = await chain.ainvoke(inputs)
+            await get_executor("retrieval").run(self.explain_cache.put, cache_key, response, chunk_ids)
+            return response, packing
+
+        # The cache key covers snippet, retrieved chunks and prompt version, so it is
+        # also the right key for sharing one in-flight generation
+        response, packing = await self._flights["explain"].do(cache_key, generate)
+        return ExplainResponse(
+            markdown=response,
+            context_tokens=packing["tokens_after"],
+            tokens_saved=packing["tokens_saved"]
+        )
+
+    async def stream_explain(self, code_snippet: str, file_path: str, line_numbers: str, filters=None):
+        """Streaming explain_code: yields (event, data) pairs.
+
+        A "context" event with the retrieved cards comes first, then "token"
+        events as the LLM produces them, then "done" with time-to-first-token
+        and total latency. Cache hits are sent as a single token.
+        """
+        start = time.perf_counter()
+        if not self.db or not self.llm:
+            yield "error", {"message": "Context Engine is not initialized. Please check server logs."}
+            return
+
+        scored, chunk_ids, cache_key = await self._retrieve_for_explain(code_snippet, filters)
+        yield "context", {
+            "cards": [card.model_dump() for card in self._to_context_cards(scored)],
+            "retrieval_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+        cached = await get_executor("retrieval").run(self.explain_cache.get, cache_key)
+        if cached is not None:
+            yield "token", {"text": cached}
+            elapsed = round((time.perf_counter() - start) * 1000, 1)
+            yield "done", {"cached": True, "first_token_ms": elapsed, "total_ms": elapsed}
+            return
+
+        chain, inputs, packing = self._explain_chain(code_snippet, file_path, line_numbers, scored)
+        parts = []
+        first_token_ms = None
+        async for token in chain.astream(inputs):
+            if not token:
+                continue
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+            parts.append(token)
+            yield "token", {"text": token}
+        # Only complete answers are cached; a dropped client raises out of the loop above
+        await get_executor("retrieval").run(self.explain_cache.put, cache_key, "".join(parts), chunk_ids)
+        yield "done", {
+            "cached": False,
+            "context_tokens": packing["tokens_after"],
+            "tokens_saved": packing["tokens_saved"],
+            "first_token_ms": first_token_ms,
+            "total_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    def _preview(self, doc: Document) -> str:
+        """One line for a card: the ingest-time summary, else the start of the chunk."""
+        summary = (doc.metadata or {}).get("summary")
+        if summary:
+            return summary
+        text = " ".join(doc.page_content.split())
+        return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS].rsplit(" ", 1)[0] + "..."
+
+    @staticmethod
+    def _title(metadata: dict) -> str:
+        return metadata.get("user") or metadata.get("title") or metadata.get("id") or "Unknown"
+
+    async def get_context_cards(self, code_snippet: str, filters=None) -> List[ContextCard]:
+        """Retrieves compact context cards; full bodies are loaded lazily via get_chunks."""
+        search_query = self._build_search_query(code_snippet)
+        scored = await self._retrieve_shared(search_query, where=metadata_where(filters))
+        return self._to_context_cards(scored)
+
+    def _to_context_cards(self, scored) -> List[ContextCard]:
+        return [
+            ContextCard(
+                id=doc.id or content_hash(doc.page_content),
+                source=doc.metadata.get("source", "unknown"),
+                title=self._title(doc.metadata),
+                url=doc.metadata.get("url"),
+                score=round(score, 4),
+                preview=self._preview(doc)
             )
-            objects.append(obj)
-        return objects
+            for doc, score in scored
+        ]
 
-    async def chat_with_gemini(self, message: str, history: List[dict] = [], context: str = None) -> str:
-        """Chats with Gemini, optionally using provided context."""
-        if not self.llm:
-            return "Context Engine is not initialized."
+    def get_chunks(self, ids: List[str], scope: str = "chunk") -> List[ChunkDetail]:
+        """Full bodies for chunk IDs, in request order.
 
+        scope="document" returns each chunk's whole parent document instead,
+        its chunks stitched back together at their overlaps.
+        """
+        if not self.db or not ids:
+            return []
+        fetched = self.db.get(ids=list(dict.fromkeys(ids)), include=["documents", "metadatas"])
+        found = {
+            doc_id: (text, meta or {})
+            for doc_id, text, meta in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])
+        }
+        details = []
+        for doc_id in ids:
+            if doc_id not in found:
+                continue
+            text, meta = found[doc_id]
+            summary = meta.get("summary")
+            sibling_ids = self.registry.chunk_ids(self._doc_key(doc_id, meta)) if scope == "document" else []
+            if len(sibling_ids) > 1:
+                siblings = self.db.get(ids=sibling_ids, include=["documents", "metadatas"])
+                order = {sibling_id: position for position, sibling_id in enumerate(sibling_ids)}
+                texts = [t for _, t in sorted(zip(siblings["ids"], siblings["documents"]), key=lambda pair: order[pair[0]])]
+                text = "\n[...]\n".join(merge_chunks(texts)) or text
+                summaries = [m.get("summary") for m in siblings["metadatas"] if m and m.get("summary")]
+                summary = summary or (summaries[0] if summaries else None)
+            details.append(ChunkDetail(
+                id=doc_id,
+                source=meta.get("source", "unknown"),
+                title=self._title(meta),
+                url=meta.get("url"),
+                summary=summary,
+                content=text
+            ))
+        return details
+
+    def _chat_chain(self, message: str, history: List[dict], context: str = None):
+        """Builds the chat chain and its inputs."""
         # Construct Prompt
         system_prompt = """You are ContextSync, an intelligent coding assistant integrated into VS Code.
         You have access to context from Slack, Jira, Confluence, and Notion.
@@ -195,82 +652,322 @@ class RAGService:
         
         chain = prompt | self.llm | StrOutputParser()
         
-        response = await chain.ainvoke({
-            "user_input": user_content_str
-        })
+        return chain, {"user_input": user_content_str}
+
+    async def chat_with_gemini(self, message: str, history: List[dict] = [], context: str = None) -> str:
+        """Chats with Gemini, optionally using provided context."""
+        if not self.llm:
+            return "Context Engine is not initialized."
+
+        chain, inputs = self._chat_chain(message, history, context)
+        response = await chain.ainvoke(inputs)
         return response
 
-    def add_documents(self, documents: List[Document]):
-        """Adds new documents to the vector store."""
-        if not self.db:
+    async def stream_chat(self, message: str, history: List[dict] = [], context: str = None):
+        """Streaming chat_with_gemini: yields ("token", ...) pairs, then ("done", timings)."""
+        start = time.perf_counter()
+        if not self.llm:
+            yield "error", {"message": "Context Engine is not initialized."}
             return
+
+        chain, inputs = self._chat_chain(message, history, context)
+        first_token_ms = None
+        async for token in chain.astream(inputs):
+            if not token:
+                continue
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+            yield "token", {"text": token}
+        yield "done", {
+            "first_token_ms": first_token_ms,
+            "total_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    def add_documents(self, documents: List[Document], mode: str = "upsert") -> dict:
+        """Adds new documents to the vector store.
+
+        Chunk IDs are content hashes, so an existing ID means the chunk text is
+        unchanged. In "upsert" mode those chunks are not re-embedded, but metadata
+        that changed (status, version, last_edited, ...) is patched in place;
+        "replace" rewrites them entirely. New chunks are always added. Chunks of
+        an earlier version of the same source document are removed and
+        tombstoned. Returns new/unchanged/patched/replaced/superseded chunk counts.
+        """
+        counts = {"new": 0, "unchanged": 0, "patched": 0, "replaced": 0, "superseded": 0}
+        if not self.db:
+            return counts
         
         # Split text (reuse same splitter logic)
         from langchain_text_splitters import RecursiveCharacterTextSplitter
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
         splits = text_splitter.split_documents(documents)
         
-        if splits:
-            import hashlib
-            # Generate deterministic IDs based on content hash to prevent duplicates
-            full_ids = [hashlib.md5(doc.page_content.encode()).hexdigest() for doc in splits]
-            
-            # Deduplicate within this batch
-            unique_ids = []
-            unique_splits = []
-            seen_ids = set()
-            for i, doc_id in enumerate(full_ids):
-                if doc_id not in seen_ids:
-                    unique_ids.append(doc_id)
-                    unique_splits.append(splits[i])
-                    seen_ids.add(doc_id)
-            
-            print(f"Adding/Updating {len(unique_splits)} unique chunks in Vector Store...")
+        if not splits:
+            return counts
+
+        # Generate deterministic IDs based on content hash to prevent duplicates
+        full_ids = [content_hash(doc.page_content) for doc in splits]
+
+        # Deduplicate within this batch
+        unique_ids = []
+        unique_splits = []
+        seen_ids = set()
+        for i, doc_id in enumerate(full_ids):
+            if doc_id not in seen_ids:
+                unique_ids.append(doc_id)
+                unique_splits.append(splits[i])
+                seen_ids.add(doc_id)
+
+        # One batched ID lookup tells us which chunks are already stored
+        existing_ids = set(self.db.get(ids=unique_ids, include=[])["ids"])
+        new_ids = [doc_id for doc_id in unique_ids if doc_id not in existing_ids]
+        new_splits = [doc for doc_id, doc in zip(unique_ids, unique_splits) if doc_id not in existing_ids]
+
+        stored = True
+        if new_splits:
+            try:
+                self._attach_summaries(new_ids, new_splits)
+                self.db.add_documents(new_splits, ids=new_ids)
+                self._index_chunks(new_ids, [doc.page_content for doc in new_splits], [doc.metadata for doc in new_splits])
+                counts["new"] = len(new_splits)
+            except Exception as e:
+                stored = False
+                print(f"Error adding documents: {e}")
+
+        if existing_ids and mode == "replace":
+            replace_ids = [doc_id for doc_id in unique_ids if doc_id in existing_ids]
+            replace_splits = [doc for doc_id, doc in zip(unique_ids, unique_splits) if doc_id in existing_ids]
+            try:
+                # Same content, so the embedding cache serves the vectors (and the summaries are reused)
+                self._attach_summaries(replace_ids, replace_splits)
+                self.db.update_documents(ids=replace_ids, documents=replace_splits)
+                self.explain_cache.invalidate_chunks(replace_ids)
+                counts["replaced"] = len(replace_splits)
+            except Exception as e:
+                print(f"Error replacing documents: {e}")
+        elif existing_ids:
+            patch_ids = [doc_id for doc_id in unique_ids if doc_id in existing_ids]
+            patch_splits = [doc for doc_id, doc in zip(unique_ids, unique_splits) if doc_id in existing_ids]
+            try:
+                counts["patched"] = self._patch_metadata(patch_ids, [doc.metadata for doc in patch_splits])
+            except Exception as e:
+                print(f"Error patching document metadata: {e}")
+            counts["unchanged"] = len(existing_ids) - counts["patched"]
+
+        # Only retire the old version once the new one is stored
+        if stored:
+            documents = {}
+            for doc_id, doc in zip(full_ids, splits):
+                documents.setdefault(self._doc_key(doc_id, doc.metadata), []).append(doc_id)
             try:
-                self.db.add_documents(unique_splits, ids=unique_ids)
+                counts["superseded"] = self._tombstone(self.registry.replace(documents))
             except Exception as e:
-                if "Duplicate" in str(e) or "already exists" in str(e).lower():
-                    print("Some documents already exist. Updating by deletion/insertion...")
-                    try:
-                        self.db.delete(ids=unique_ids)
-                        self.db.add_documents(unique_splits, ids=unique_ids)
-                    except Exception as delete_error:
-                        print(f"Error during upsert (delete+add): {delete_error}")
-                else:
-                    print(f"Error adding documents: {e}")
-
-    async def get_context_stats_batch(self, snippets: List[str]) -> List[dict]:
-        """Retrieves stats for a list of code snippets."""
+                print(f"Error retiring superseded chunks: {e}")
+
+        print(f"Vector Store: {counts['new']} new, {counts['unchanged']} unchanged, {counts['patched']} patched, "
+              f"{counts['replaced']} replaced, {counts['superseded']} superseded chunks.")
+        return counts
+
+    def delete_documents(self, doc_keys: List[str]) -> int:
+        """Removes source documents (keys as in data_processing.document_key). Returns chunks removed."""
+        if not self.db or not doc_keys:
+            return 0
+        return self._tombstone(self.registry.remove(doc_keys))
+
+    def _tombstone(self, dropped: dict) -> int:
+        """Deletes chunk_id -> doc_key entries from the vector store and tombstones them.
+
+        Deleting right away keeps stale text out of the top k; the side stores
+        are cleaned up by compact().
+        """
+        if not dropped:
+            return 0
+        ids = list(dropped)
+        fetched = self.db.get(ids=ids, include=["documents", "embeddings"])
+        sizes = {chunk_id: (doc_key, 0) for chunk_id, doc_key in dropped.items()}
+        for chunk_id, text, vector in zip(fetched["ids"], fetched["documents"], fetched["embeddings"]):
+            # float32 vector plus the stored text; Chroma's own index overhead comes on top
+            sizes[chunk_id] = (dropped[chunk_id], len(vector) * 4 + len((text or "").encode()))
+        # Tombstone first, so a crash before the delete is finished by the next compaction
+        self.registry.tombstone(sizes)
+        self.db.delete(ids=ids)
+        self.explain_cache.invalidate_chunks(ids)
+        return len(ids)
+
+    def compact(self, batch_size: int = 500) -> dict:
+        """Purges tombstoned chunks from every side store and reports what was reclaimed."""
+        report = {"vectors": 0, "bytes": 0, "documents": 0}
+        if not self.db:
+            return report
+        while True:
+            tombstones = self.registry.pending_tombstones(batch_size)
+            if not tombstones:
+                break
+            ids = [chunk_id for chunk_id, _, _ in tombstones]
+            doc_keys = list(dict.fromkeys(doc_key for _, doc_key, _ in tombstones))
+            self.db.delete(ids=ids)
+            self.lexical_index.remove(ids)
+            self.summary_store.remove(ids)
+            self.explain_cache.invalidate_chunks(ids)
+
+            # Mentions are per document, so rebuild them from each document's live chunks
+            live = {doc_key: self.registry.chunk_ids(doc_key) for doc_key in doc_keys}
+            live_ids = [chunk_id for chunk_ids in live.values() for chunk_id in chunk_ids]
+            self.mention_index.remove(ids + live_ids, doc_keys)
+            if live_ids:
+                current = self.db.get(ids=live_ids, include=["documents", "metadatas"])
+                self.mention_index.add(zip(current["ids"], current["documents"], current["metadatas"]), document_key)
+
+            self.registry.clear_tombstones(ids)
+            report["vectors"] += len(ids)
+            report["bytes"] += sum(size for _, _, size in tombstones)
+            report["documents"] += len(doc_keys)
+        self._compacted_vectors += report["vectors"]
+        self._compacted_bytes += report["bytes"]
+        return report
+
+    def _patch_metadata(self, ids: List[str], metadatas: List[dict]) -> int:
+        """Writes the metadata fields that differ from what is stored, leaving vectors alone.
+
+        Returns the number of chunks patched.
+        """
+        stored = self.db.get(ids=ids, include=["metadatas"])
+        stored = {doc_id: meta or {} for doc_id, meta in zip(stored["ids"], stored["metadatas"])}
+        patch_ids = []
+        patches = []
+        for doc_id, meta in zip(ids, metadatas):
+            current = stored.get(doc_id)
+            if current is None:
+                continue
+            # Chroma can't store None; a field that went empty keeps its last value
+            patch = {key: value for key, value in meta.items() if value is not None and current.get(key) != value}
+            if patch:
+                patch_ids.append(doc_id)
+                patches.append(patch)
+        if not patch_ids:
+            return 0
+
+        # collection.update merges keys, so the summary and untouched fields survive
+        self.db._collection.update(ids=patch_ids, metadatas=patches)
+        self.explain_cache.invalidate_chunks(patch_ids)
+        statuses = {
+            document_key({**stored[doc_id], **patch}): patch["status"]
+            for doc_id, patch in zip(patch_ids, patches) if "status" in patch
+        }
+        for doc_key, status in statuses.items():
+            if doc_key:
+                self.mention_index.set_status(doc_key, status)
+        return len(patch_ids)
+
+    def update_document_metadata(self, source: str, doc_id: str, patch: dict, id_field: str = "id") -> int:
+        """Patches metadata on every chunk of one source document, without re-embedding.
+
+        Returns the number of chunks updated.
+        """
+        if not self.db:
+            return 0
+        existing = self.db.get(where={"$and": [{"source": source}, {id_field: doc_id}]}, include=[])
+        if not existing["ids"]:
+            return 0
+        return self._patch_metadata(existing["ids"], [patch] * len(existing["ids"]))
+
+    def _count_stats(self, metadatas: List[dict]) -> dict:
+        """Counts Slack/Jira documents (and open Jira tickets) in one result set.
+
+        Several chunks of one long ticket or page count once, as they do in the
+        mention index.
+        """
+        slack_count = 0
+        jira_count = 0
+        open_jira_count = 0
+
+        seen = set()
+        for meta in metadatas:
+            meta = meta or {}
+            key = document_key(meta)
+            if key:
+                if key in seen:
+                    continue
+                seen.add(key)
+            source = meta.get("source")
+            if source == "slack":
+                slack_count += 1
+            elif source == "jira":
+                jira_count += 1
+                status = (meta.get("status") or "").lower()
+                # Count as open if status is valid and NOT done/closed
+                if status and status not in ["done", "closed", "resolved"]:
+                    open_jira_count += 1
+
+        return {
+            "slack_count": slack_count,
+            "jira_count": jira_count,
+            "open_jira_count": open_jira_count
+        }
+
+    def _query_metadatas(self, queries: List[str], k: int, vectors: List[List[float]] = None,
+                         where: dict = None) -> List[List[dict]]:
+        """Embeds all queries at once (unless given their vectors) and runs a single multi-query.
+
+        Only metadata and distances are fetched, and weak matches are cut the same
+        way as in retrieve_scored so they don't inflate the counts.
+        """
+        if vectors is None:
+            vectors = self._get_embeddings().embed_queries(queries)
+        results = self.db._collection.query(
+            query_embeddings=vectors,
+            n_results=k,
+            where=where,
+            include=["metadatas", "distances"]
+        )
+        relevance = self._relevance_fn()
+        return [
+            [meta for meta, _ in self._cut_by_relevance(
+                [(meta, relevance(distance)) for meta, distance in zip(metadatas, distances)]
+            )]
+            for metadatas, distances in zip(results["metadatas"], results["distances"])
+        ]
+
+    async def get_context_stats_batch(self, snippets: List[str], symbols: List[str] = None, filters=None) -> List[dict]:
+        """Retrieves stats for a list of code snippets.
+
+        When the editor sends symbol names, stats come straight from the mention
+        index. Snippets without a symbol, or whose symbol nothing mentions, fall
+        back to vector search: all of them embedded in one call and searched
+        with one multi-query, fetching only the metadata needed for counting.
+        With filters, only the vector search can honour them, and it only
+        searches the matching subset (e.g. open Jira tickets).
+        """
         if not self.db:
             return [{"slack_count": 0, "jira_count": 0, "open_jira_count": 0} for _ in snippets]
+        if not snippets:
+            return []
 
-        stats_results = []
-        for snippet in snippets:
-            # We use a smaller k for stats to be faster/more focused
-            keywords = self._extract_keywords(snippet)
-            search_query = f"{snippet}\nKeywords: {keywords}"
-            docs = self.retrieve(search_query, k=10)
-            
-            slack_count = 0
-            jira_count = 0
-            open_jira_count = 0
-            
-            for doc in docs:
-                source = doc.metadata.get("source")
-                if source == "slack":
-                    slack_count += 1
-                elif source == "jira":
-                    jira_count += 1
-                    status = doc.metadata.get("status", "").lower()
-                    # Count as open if status is valid and NOT done/closed
-                    if status and status not in ["done", "closed", "resolved"]:
-                        open_jira_count += 1
-            
-            stats_results.append({
-                "slack_count": slack_count,
-                "jira_count": jira_count,
-                "open_jira_count": open_jira_count
-            })
-            
-        return stats_results
+        where = metadata_where(filters)
+        stats = [None] * len(snippets)
+        if symbols and where is None:
+            # SQLite lookup that waits on the index lock while an ingest writes, so off the event loop
+            symbol_stats = await get_executor("retrieval").run(self.mention_index.stats_batch, symbols[:len(snippets)])
+            for i, found in enumerate(symbol_stats):
+                stats[i] = found
+
+        fallback = [i for i, s in enumerate(stats) if s is None]
+        if not fallback:
+            return stats
+
+        # Identical snippets (e.g. overloads) share one embedding and one query slot
+        snippet_queries = {i: self._build_search_query(snippets[i]) for i in fallback}
+        queries = list(dict.fromkeys(snippet_queries.values()))
+        # We use a smaller k for stats to be faster/more focused
+        async def run():
+            vectors = await self._get_embedding_batcher().embed_many(queries)
+            return await get_executor("retrieval").run(self._query_metadatas, queries, 10, vectors, where)
 
+        results = await self._flights["stats"].do((tuple(queries), self._where_key(where)), run)
+        stats_by_query = {
+            query: self._count_stats(metadatas)
+            for query, metadatas in zip(queries, results)
+        }
+        for i, query in snippet_queries.items():
+            stats[i] = stats_by_query[query]
+        return stats
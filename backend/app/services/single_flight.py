@@ -0,0 +1,47 @@
+# app/services/single_flight.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one.
+
+    The first caller for a key (the leader) starts the work; callers that
+    arrive with the same key while it is running await the same task instead
+    of repeating it. Nothing is kept once the task finishes, so this only
+    deduplicates bursts and is not a cache.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        else:
+            self.shared += 1
+        # shield: one caller disconnecting must not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter was cancelled
+            task.exception()
+
+    def get_stats(self) -> dict:
+        calls = self.leaders + self.shared
+        return {
+            "calls": calls,
+            "upstream_calls": self.leaders,
+            "coalesced": self.shared,
+            "coalesced_rate": round(self.shared / calls, 4) if calls else 0.0,
+            "in_flight": len(self._inflight)
+        }
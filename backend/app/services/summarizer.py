@@ -0,0 +1,149 @@
+# app/services/summarizer.py
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+# Each chunk is at most ~1000 chars, but keep the prompt bounded regardless
+MAX_CHARS_PER_ITEM = 1500
+# Chunks the LLM keeps skipping are given up on; their cards fall back to a snippet
+MAX_ATTEMPTS = 3
+NUMBERED_LINE = re.compile(r"^\s*\[?(\d+)[\].):]\s*(.+?)\s*$")
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You write one-line summaries of Slack messages, Jira tickets and wiki pages for developers. "
+     "For every numbered item, reply with exactly one line formatted as '<number>. <summary>', in order. "
+     "Each summary is one concise sentence that says what the item decides, reports or asks."),
+    ("user", "{items}")
+])
+
+class SummaryStore:
+    """One-line chunk summaries keyed by chunk ID (the content hash), plus the queue of chunks still to summarize.
+
+    Persisted to SQLite, so re-ingesting an unchanged chunk never costs another LLM call.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS summaries (chunk_id TEXT PRIMARY KEY, summary TEXT NOT NULL, created REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending (chunk_id TEXT PRIMARY KEY, attempts INTEGER NOT NULL DEFAULT 0, queued REAL NOT NULL)"
+        )
+        # Chunks past MAX_ATTEMPTS, remembered so a startup backfill doesn't queue them again
+        self._conn.execute("CREATE TABLE IF NOT EXISTS given_up (chunk_id TEXT PRIMARY KEY, created REAL NOT NULL)")
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            (summaries,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+            (pending,) = self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()
+            (given_up,) = self._conn.execute("SELECT COUNT(*) FROM given_up").fetchone()
+        return summaries + pending + given_up
+
+    def get_many(self, chunk_ids: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._conn.execute(
+                    f"SELECT chunk_id, summary FROM summaries WHERE chunk_id IN ({placeholders})", batch
+                ))
+        return found
+
+    def enqueue(self, chunk_ids: Iterable[str]) -> int:
+        """Queues chunks that have no summary yet and weren't given up on. Returns how many were queued."""
+        chunk_ids = list(dict.fromkeys(chunk_ids))
+        if not chunk_ids:
+            return 0
+        known = set(self.get_many(chunk_ids))
+        with self._lock:
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                known.update(row[0] for row in self._conn.execute(
+                    f"SELECT chunk_id FROM given_up WHERE chunk_id IN ({placeholders})", batch
+                ))
+        rows = [(chunk_id, time.time()) for chunk_id in chunk_ids if chunk_id not in known]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO pending (chunk_id, queued) VALUES (?, ?)", rows)
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def next_pending(self, limit: int) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT chunk_id FROM pending ORDER BY attempts ASC, queued ASC LIMIT ?", (limit,)
+            )]
+
+    def put(self, summaries: Dict[str, str]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO summaries (chunk_id, summary, created) VALUES (?, ?, ?)",
+                [(chunk_id, summary, now) for chunk_id, summary in summaries.items()]
+            )
+            self._conn.executemany("DELETE FROM pending WHERE chunk_id = ?", [(chunk_id,) for chunk_id in summaries])
+            self._conn.executemany("DELETE FROM given_up WHERE chunk_id = ?", [(chunk_id,) for chunk_id in summaries])
+            self._conn.commit()
+
+    def failed(self, chunk_ids: List[str]) -> int:
+        """Counts a failed attempt for each chunk; gives up on chunks past MAX_ATTEMPTS. Returns how many were given up."""
+        with self._lock:
+            self._conn.executemany("UPDATE pending SET attempts = attempts + 1 WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.execute(
+                "INSERT OR IGNORE INTO given_up (chunk_id, created) SELECT chunk_id, ? FROM pending WHERE attempts >= ?",
+                (time.time(), MAX_ATTEMPTS)
+            )
+            before = self._conn.total_changes
+            self._conn.execute("DELETE FROM pending WHERE attempts >= ?", (MAX_ATTEMPTS,))
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def discard(self, chunk_ids: List[str]):
+        """Forgets queued chunks that no longer exist in the vector store."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.commit()
+
+    def remove(self, chunk_ids: List[str]):
+        """Drops summaries and queue entries of chunks that were compacted away."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM summaries WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.executemany("DELETE FROM pending WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.executemany("DELETE FROM given_up WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.commit()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            (summaries,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+            (pending,) = self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()
+            (given_up,) = self._conn.execute("SELECT COUNT(*) FROM given_up").fetchone()
+        return {"summaries": summaries, "pending": pending, "given_up": given_up}
+
+def parse_numbered_summaries(text: str, count: int) -> Dict[int, str]:
+    """Maps 0-based item index -> summary from '<n>. summary' lines, ignoring anything else."""
+    summaries = {}
+    for line in text.splitlines():
+        match = NUMBERED_LINE.match(line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        if 0 <= index < count and index not in summaries and match.group(2):
+            summaries[index] = match.group(2)
+    return summaries
+
+async def summarize_batch(llm, texts: List[str]) -> Dict[int, str]:
+    """Summarizes many chunks with a single LLM call. Items the reply skips are left out."""
+    items = "\n\n".join(f"[{i + 1}]\n{text[:MAX_CHARS_PER_ITEM]}" for i, text in enumerate(texts))
+    chain = SUMMARY_PROMPT | llm | StrOutputParser()
+    reply = await chain.ainvoke({"items": items})
+    return parse_numbered_summaries(reply, len(texts))
@@ -0,0 +1,44 @@
+# app/services/sync_state.py
+
+import os
+import json
+import threading
+
+class SyncStateStore:
+    """Persisted per-source sync cursors (Slack ts, Jira/Confluence/Notion timestamps).
+
+    Stored as a small JSON file that is rewritten atomically on every update, so
+    a crash mid-sync leaves the previous watermarks intact.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Could not read sync state at {path}, starting fresh: {e}")
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            return self._state.get(key, default)
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._state[key] = value
+            self._save()
+
+    def merge(self, key: str, values: dict):
+        """Updates a dict-valued key in one locked read-modify-write."""
+        with self._lock:
+            self._state[key] = {**self._state.get(key, {}), **values}
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
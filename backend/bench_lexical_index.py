@@ -0,0 +1,62 @@
+import sys
+import time
+import tempfile
+import numpy as np
+
+from app.services.lexical_index import BM25Index
+
+# BM25 search latency on a synthetic corpus shaped like Slack/Jira chunks:
+# Zipf-distributed prose plus code identifiers, queried with code snippets as
+# /explain and /context/retrieve send them. In-process, no server needed.
+#   python bench_lexical_index.py [chunks]
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+WORDS_PER_CHUNK = 80
+QUERIES = 200
+K = 15
+
+COMMON = ["the", "a", "to", "is", "in", "of", "and", "for", "on", "it", "we", "this", "that", "with", "be", "after",
+          "deploy", "build", "fix", "error", "issue", "test", "service", "update", "failed", "prod"]
+
+def make_corpus(rng):
+    vocab = np.array(COMMON + [f"word{i}" for i in range(20000)])
+    identifiers = np.array([f"{verb}_{noun}" for verb in ["process", "load", "sync", "parse", "get", "handle"]
+                            for noun in [f"thing{i}" for i in range(500)]])
+    ranks = np.minimum(rng.zipf(1.3, (N, WORDS_PER_CHUNK)) - 1, len(vocab) - 1)
+    docs = []
+    for i, row in enumerate(ranks):
+        words = list(vocab[row])
+        words[::20] = identifiers[rng.integers(0, len(identifiers), len(words[::20]))]
+        docs.append((f"chunk-{i}", " ".join(words)))
+    queries = [
+        f"def {identifiers[j]}(self, amount, token):\n    result = self.gateway.charge(amount, token)\n"
+        f"    if result is None:\n        return self.{identifiers[(j * 7) % len(identifiers)]}(amount)\n    return result"
+        for j in rng.integers(0, len(identifiers), QUERIES)
+    ]
+    return docs, queries
+
+def bench():
+    rng = np.random.default_rng(0)
+    docs, queries = make_corpus(rng)
+    path = tempfile.mktemp(prefix="contextsync_bm25_", suffix=".db")
+    start = time.perf_counter()
+    index = BM25Index(path)
+    for offset in range(0, N, 5000):
+        index.add(docs[offset:offset + 5000])
+    print(f"{N} chunks indexed in {time.perf_counter() - start:.1f}s")
+
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=K)
+        samples.append((time.perf_counter() - start) * 1000)
+    # First use of a term builds its postings arrays; steady state is the repeat pass
+    warm = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=K)
+        warm.append((time.perf_counter() - start) * 1000)
+    print(f"search ms p50/p95: first pass {np.percentile(samples, 50):.3f} / {np.percentile(samples, 95):.3f}, "
+          f"repeat {np.percentile(warm, 50):.3f} / {np.percentile(warm, 95):.3f}")
+
+if __name__ == "__main__":
+    bench()
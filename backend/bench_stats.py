@@ -0,0 +1,43 @@
+import time
+import requests
+
+# Benchmarks /context/stats latency against the number of snippets per request.
+# Run with the backend up (uvicorn app.main:app). Batched stats should stay
+# roughly flat as the snippet count grows; cold = new snippets, warm = repeat.
+url = "http://127.0.0.1:8000/context/stats"
+SIZES = [1, 5, 10, 20, 40, 60]
+
+def make_snippets(n, run_id):
+    """Builds n distinct function snippets, similar to what the CodeLens provider sends."""
+    return [
+        f"""
+    def process_payment_{run_id}_{i}(self, amount: float, card_token: str) -> bool:
+        retry_count = 0
+        while retry_count <= self.max_retries:
+            result = self.gateway.charge(amount, card_token)
+"""
+        for i in range(n)
+    ]
+
+def timed_post(snippets):
+    start = time.perf_counter()
+    response = requests.post(url, json={"snippets": snippets}, timeout=120)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    response.raise_for_status()
+    return elapsed_ms
+
+def bench():
+    run_id = int(time.time())
+    print(f"{'snippets':>8} | {'cold ms':>9} | {'warm ms':>9} | {'cold ms/snippet':>15}")
+    print("-" * 50)
+    for n in SIZES:
+        snippets = make_snippets(n, f"{run_id}_{n}")
+        cold = timed_post(snippets)
+        warm = timed_post(snippets)
+        print(f"{n:>8} | {cold:>9.1f} | {warm:>9.1f} | {cold / n:>15.1f}")
+
+if __name__ == "__main__":
+    try:
+        bench()
+    except Exception as e:
+        print(f"Error: {e}")
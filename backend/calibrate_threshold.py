@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+
+# Picks RELEVANCE_THRESHOLD / RELEVANCE_SCORE_GAP from a labeled query set.
+# Each label is {"snippet": <code>, "relevant": [document keys]}, where a key is
+# what data_processing.document_key gives, e.g. "jira:PAY-1024" or
+# "slack:C123:1700000000.0001". Runs against the local vector store with the
+# configured models, scoring the same hybrid candidates /explain would see.
+
+load_dotenv()
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.rag import RAGService
+from app.services.data_processing import document_key
+
+GAPS = [0.0, 0.05, 0.1, 0.15, 0.2, 0.3]
+
+def load_candidates(rag, labels, k):
+    """Scored (doc key, relevance) candidates per labeled query, before any cutoff."""
+    rag.relevance_threshold = float("-inf")
+    rag.relevance_score_gap = 0.0
+    candidates = []
+    for label in labels:
+        query = rag._build_search_query(label["snippet"])
+        scored = rag.retrieve_scored(query, k=k)
+        candidates.append([(document_key(doc.metadata or {}) or doc.id, score) for doc, score in scored])
+    return candidates
+
+def evaluate(rag, labels, candidates, threshold, gap):
+    """Micro-averaged precision/recall over source documents kept by this cutoff."""
+    rag.relevance_threshold = threshold
+    rag.relevance_score_gap = gap
+    true_positives = predicted = expected = 0
+    for label, scored in zip(labels, candidates):
+        kept = {key for key, _ in rag._cut_by_relevance(scored)}
+        relevant = set(label["relevant"])
+        true_positives += len(kept & relevant)
+        predicted += len(kept)
+        expected += len(relevant)
+    precision = true_positives / predicted if predicted else 1.0
+    recall = true_positives / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1, predicted
+
+def calibrate(labels_path, k, min_precision):
+    with open(labels_path) as f:
+        labels = json.load(f)
+    rag = RAGService()
+    if not rag.db:
+        print("Vector store unavailable; ingest data first.")
+        return
+
+    candidates = load_candidates(rag, labels, k)
+    thresholds = sorted({round(score, 2) for scored in candidates for _, score in scored})
+    results = []
+    for threshold in thresholds:
+        for gap in GAPS:
+            precision, recall, f1, kept = evaluate(rag, labels, candidates, threshold, gap)
+            results.append((threshold, gap, precision, recall, f1, kept))
+
+    if min_precision is not None:
+        eligible = [r for r in results if r[2] >= min_precision] or results
+        best = max(eligible, key=lambda r: (r[3], r[2], r[0]))
+    else:
+        # Ties go to the higher threshold (less context sent), then the smallest gap
+        best = max(results, key=lambda r: (r[4], r[0], -r[1]))
+
+    print(f"{len(labels)} labeled queries, {sum(len(c) for c in candidates)} candidates (k={k})\n")
+    print(f"{'threshold':>9} | {'gap':>5} | {'precision':>9} | {'recall':>6} | {'f1':>5} | {'kept':>4}")
+    print("-" * 52)
+    for threshold, gap, precision, recall, f1, kept in sorted(results, key=lambda r: r[4], reverse=True)[:15]:
+        print(f"{threshold:>9.2f} | {gap:>5.2f} | {precision:>9.3f} | {recall:>6.3f} | {f1:>5.3f} | {kept:>4}")
+    print(f"\nRecommended:\nRELEVANCE_THRESHOLD={best[0]:.2f}\nRELEVANCE_SCORE_GAP={best[1]:.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the retrieval relevance cutoff from labeled queries.")
+    parser.add_argument("labels", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "relevance_labels.json"))
+    parser.add_argument("--k", type=int, default=15, help="candidates retrieved per query")
+    parser.add_argument("--min-precision", type=float, default=None, help="maximize recall subject to this precision")
+    args = parser.parse_args()
+    calibrate(args.labels, args.k, args.min_precision)
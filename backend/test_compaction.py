@@ -0,0 +1,76 @@
+import asyncio
+
+from testing_env import use_temp_stores
+
+# Re-ingests edited documents and checks the old chunks are retired: gone from
+# the vector store and the top k at once, and purged from the side stores by
+# compaction, which reports what it reclaimed. In-process, fake models.
+
+use_temp_stores("contextsync_compact_")
+
+from fastapi.testclient import TestClient
+from app import main as app_main
+from app.services.rag import RAGService
+from app.services.data_processing import process_slack_data, process_confluence_data
+
+VERSIONS = 5
+
+def page(version):
+    # Several chunks per version, each one different in every version
+    body = " ".join(f"<p>v{version}: `retry_refund` waits {version * 10 + i}s before step {i}.</p>" for i in range(60))
+    return [{"id": "9001", "title": "Refund runbook", "url": "", "version": version, "body": body, "last_modified": str(version)}]
+
+def message(text):
+    return [{"ts": "1700000000.000100", "user": "dave", "text": text}]
+
+async def main():
+    rag = RAGService()
+    total = 0
+    for version in range(1, VERSIONS + 1):
+        counts = rag.add_documents(process_confluence_data(page(version)) + process_slack_data(message(f"`retry_refund` edit {version}"), "C1"))
+        total += counts["new"]
+    live = rag.registry.chunk_ids("confluence:9001")
+    stored = rag.db._collection.count()
+    print(f"{VERSIONS} versions ingested: {total} chunks written, {stored} in the store, {len(live)} live for the page")
+    assert stored == len(live) + 1, "only the latest page version and Slack edit should stay searchable"
+    assert rag.registry.chunk_ids("slack:C1:1700000000.000100")
+
+    hits = rag.retrieve("retry_refund", k=15)
+    current = set(live) | set(rag.registry.chunk_ids("slack:C1:1700000000.000100"))
+    assert hits and all(doc.id in current for doc in hits), "stale versions in the top k"
+
+    stats = rag.registry.get_stats()
+    print(f"registry before compaction: {stats}")
+    assert stats["tombstones"] == total - stored
+    assert len(rag.lexical_index) == total
+
+    report = rag.compact()
+    print(f"compaction: {report}")
+    assert report["vectors"] == total - stored and report["bytes"] > 0
+    assert len(rag.lexical_index) == stored
+    assert len(rag.mention_index) == stored
+    assert rag.registry.get_stats()["tombstones"] == 0
+    # Mentions are rebuilt from the live chunks, so the page and the message still count once each
+    assert rag.mention_index.stats("retry_refund") is not None
+
+    page_text = rag.get_chunks([live[0]], scope="document")[0].content
+    assert f"v{VERSIONS}:" in page_text and "v1:" not in page_text
+
+    # Deletions arrive through the API, as a source's delete webhook would send them
+    app_main.rag_service = rag
+    response = TestClient(app_main.app).post("/context/documents/delete", json={"doc_keys": ["slack:C1:1700000000.000100"]})
+    removed = response.json()["chunks_removed"]
+    print(f"deleted the Slack message: {removed} chunk(s), compaction: {rag.compact()}")
+    assert response.status_code == 200 and removed == 1 and rag.db._collection.count() == len(live)
+    assert not rag.registry.chunk_ids("slack:C1:1700000000.000100")
+    assert all(doc.id in live for doc in rag.retrieve("retry_refund edit", k=15))
+
+    # Reverting to an old version brings its chunks back as new ones
+    counts = rag.add_documents(process_confluence_data(page(1)))
+    print(f"revert to v1: {counts}")
+    assert counts["superseded"] == len(live)
+    assert rag.compact()["vectors"] == len(live)
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    print("\nSUCCESS: superseded chunks are retired and compacted.")
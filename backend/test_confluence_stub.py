@@ -0,0 +1,111 @@
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Runs IntegrationService's Confluence sync against a local stub server that
+# counts requests, so the number of HTTP round trips per sync can be checked
+# without a real Confluence instance.
+
+PAGES = {
+    str(100 + i): {"title": f"Payment Runbook {i}", "version": 3, "body": f"<p>Gateway V2 step {i}</p>"}
+    for i in range(50)
+}
+
+class StubConfluence(BaseHTTPRequestHandler):
+    request_counts = {"search": 0, "page": 0}
+    support_expand = True
+
+    def log_message(self, *args):
+        pass
+
+    def _content(self, page_id, expanded):
+        page = PAGES[page_id]
+        content = {"id": page_id, "title": page["title"]}
+        if expanded:
+            content["body"] = {"storage": {"value": page["body"]}}
+            content["version"] = {"number": page["version"], "when": "2026-01-01T10:00:00.000Z"}
+        return content
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path.endswith("/rest/api/search"):
+            StubConfluence.request_counts["search"] += 1
+            start = int(params.get("start", ["0"])[0])
+            limit = int(params.get("limit", ["25"])[0])
+            expanded = self.support_expand and "content.body.storage" in params.get("expand", [""])[0]
+            ids = sorted(PAGES)[start:start + limit]
+            payload = {
+                "results": [{"content": self._content(i, expanded), "url": f"/pages/{i}"} for i in ids],
+                "_links": {"next": "/rest/api/search?next"} if start + limit < len(PAGES) else {}
+            }
+        elif "/rest/api/content/" in url.path:
+            StubConfluence.request_counts["page"] += 1
+            payload = self._content(url.path.rsplit("/", 1)[-1], True)
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub():
+    server = HTTPServer(("127.0.0.1", 0), StubConfluence)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def make_service(server):
+    os.environ["CONFLUENCE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["CONFLUENCE_USERNAME"] = "stub"
+    os.environ["CONFLUENCE_API_TOKEN"] = "stub"
+    from app.services.integrations import IntegrationService
+    return IntegrationService()
+
+def reset_counts():
+    StubConfluence.request_counts = {"search": 0, "page": 0}
+
+def check_expanded_search(service):
+    reset_counts()
+    StubConfluence.support_expand = True
+    pages = service.search_confluence_pages_since("type=page", modified_since="2026-01-01T00:00:00.000Z")
+    print(f"Expanded search: {len(pages)} pages, requests={StubConfluence.request_counts}")
+    assert len(pages) == 50
+    assert StubConfluence.request_counts == {"search": 1, "page": 0}
+
+def check_fallback_fetch(service):
+    reset_counts()
+    StubConfluence.support_expand = False
+    pages = service.search_confluence_pages_since("type=page", modified_since="2026-01-01T00:00:00.000Z")
+    print(f"Fallback fetch: {len(pages)} pages, requests={StubConfluence.request_counts}")
+    assert len(pages) == 50
+    assert StubConfluence.request_counts == {"search": 1, "page": 50}
+
+def check_unchanged_versions_skipped(service):
+    reset_counts()
+    StubConfluence.support_expand = True
+    known = {page_id: page["version"] for page_id, page in PAGES.items()}
+    PAGES["105"]["version"] = 4
+    pages = service.search_confluence_pages_since(
+        "type=page", modified_since="2026-01-01T00:00:00.000Z", known_versions=known
+    )
+    print(f"Known versions: {len(pages)} changed pages, requests={StubConfluence.request_counts}")
+    assert [p["id"] for p in pages] == ["105"]
+    assert StubConfluence.request_counts == {"search": 1, "page": 0}
+
+if __name__ == "__main__":
+    server = start_stub()
+    try:
+        service = make_service(server)
+        check_expanded_search(service)
+        check_fallback_fetch(service)
+        check_unchanged_versions_skipped(service)
+        print("\nSUCCESS: Confluence sync request counts as expected.")
+    finally:
+        server.shutdown()
@@ -0,0 +1,97 @@
+import json
+import time
+
+from testing_env import use_temp_stores
+
+# Compares the compact /context/retrieve cards against the old payload (a 300
+# char snippet plus the full text in every object), and checks that
+# /context/chunks returns bodies with a working ETag. In-process, fake models.
+
+use_temp_stores("contextsync_cards_")
+
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from app import main
+from app.services.data_processing import process_slack_data
+
+SNIPPET = "def process_payment(self, amount, card_token):\n    return self.gateway.charge(amount, card_token)"
+
+def seed(rag):
+    def body(n):
+        return " ".join(f"PAY-{n} retry note {i}: Gateway V2 charges must carry idempotency keys before retrying." for i in range(40))
+    docs = [
+        Document(page_content=f"Ticket: PAY-{n} | Title: Payment retries {n}\nDescription: {body(n)}",
+                 metadata={"source": "jira", "id": f"PAY-{n}", "title": f"Payment retries {n}", "status": "Open"})
+        for n in range(15)
+    ]
+    rag.add_documents(docs)
+
+def legacy_payload(cards, client):
+    """What /context/retrieve used to send for the same hits."""
+    details = client.get("/context/chunks", params={"ids": ",".join(c["id"] for c in cards)}).json()
+    return json.dumps([{
+        "source": d["source"],
+        "title_or_user": d["title"],
+        "url": d["url"],
+        "content_summary": f"**Snippet**: {d['content'][:300]}...\n\n**Raw Source**:\n{d['content']}",
+        "relevance_score": 0.0,
+        "related_code_files": []
+    } for d in details])
+
+def check_payload_size(client):
+    response = client.post("/context/retrieve", json={"code_snippet": SNIPPET, "file_path": "p.py", "line_numbers": "1-2"})
+    assert response.status_code == 200
+    cards = response.json()
+    legacy = legacy_payload(cards, client)
+
+    start = time.perf_counter()
+    for _ in range(200):
+        json.dumps(cards)
+    compact_ms = (time.perf_counter() - start) * 1000 / 200
+    start = time.perf_counter()
+    legacy_objects = json.loads(legacy)
+    for _ in range(200):
+        json.dumps(legacy_objects)
+    legacy_ms = (time.perf_counter() - start) * 1000 / 200
+
+    print(f"{len(cards)} cards: {len(response.content)} bytes vs {len(legacy)} bytes before "
+          f"({len(legacy) / len(response.content):.1f}x smaller)")
+    print(f"serialization: {compact_ms:.3f}ms vs {legacy_ms:.3f}ms before")
+    assert set(cards[0]) <= {"id", "source", "title", "url", "score", "preview"}
+    assert len(response.content) * 3 < len(legacy)
+    return cards
+
+def check_chunk_details(client, cards):
+    ids = ",".join(card["id"] for card in cards[:2])
+    response = client.get("/context/chunks", params={"ids": ids})
+    assert response.status_code == 200
+    details = response.json()
+    assert [d["id"] for d in details] == [card["id"] for card in cards[:2]]
+    assert all(d["content"] and d["title"] == card["title"] for d, card in zip(details, cards))
+
+    etag = response.headers["etag"]
+    again = client.get("/context/chunks", params={"ids": ids}, headers={"If-None-Match": etag})
+    print(f"/context/chunks: {len(response.content)} bytes, revalidation -> {again.status_code}")
+    assert again.status_code == 304 and not again.content
+
+    document = client.get("/context/chunks", params={"ids": cards[0]["id"], "scope": "document"}).json()[0]
+    print(f"scope=document: {len(document['content'])} chars vs {len(details[0]['content'])} for one chunk")
+    assert len(document["content"]) >= len(details[0]["content"])
+
+def check_slack_document_scope(client, rag):
+    # Slack chunks carry their ts as "timestamp"; a long message must come back whole from any of its chunks
+    text = " ".join(f"step {i}: drain the payment queue before restarting the Gateway V2 workers." for i in range(60))
+    rag.add_documents(process_slack_data([{"ts": "1700000000.000200", "user": "dave", "text": text}], "C-PAY"))
+    chunk_ids = rag.registry.chunk_ids("slack:C-PAY:1700000000.000200")
+    assert len(chunk_ids) > 1
+    document = client.get("/context/chunks", params={"ids": chunk_ids[-1], "scope": "document"}).json()[0]
+    print(f"Slack scope=document: {len(chunk_ids)} chunks -> {len(document['content'])} chars")
+    assert "step 0:" in document["content"] and "step 59:" in document["content"]
+
+if __name__ == "__main__":
+    with TestClient(main.app) as client:
+        seed(main.rag_service)
+        cards = check_payload_size(client)
+        check_chunk_details(client, cards)
+        check_slack_document_scope(client, main.rag_service)
+    print("\nSUCCESS: compact cards and lazy chunk details work as expected.")
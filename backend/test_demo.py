@@ -24,9 +24,9 @@ try:
     
     if response.status_code == 200:
         data = response.json()
-        print(f"Received {len(data)} context objects.")
+        print(f"Received {len(data)} context cards.")
         for item in data:
-            title = item.get('title_or_user', 'No Title')
+            title = item.get('title', 'No Title')
             source = item.get('source', 'unknown')
             print(f" - [{source}] {title}")
             print(f"   URL: {item.get('url', 'No URL')}")
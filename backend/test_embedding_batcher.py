@@ -0,0 +1,46 @@
+import time
+import asyncio
+
+from testing_env import use_temp_stores, CountingEmbeddings
+
+# Fires concurrent /context/retrieve-style requests for *different* snippets at
+# RAGService (fake models, temp stores) and checks their query embeddings are
+# micro-batched into a few embed_documents calls instead of one call each.
+
+use_temp_stores("contextsync_batcher_", RELEVANCE_SCORE_GAP="0", EMBED_BATCH_WINDOW_MS="10", EMBED_BATCH_MAX_SIZE="16")
+
+from langchain_core.documents import Document
+from app.services.rag import RAGService
+
+REQUESTS = 40
+
+async def main():
+    rag = RAGService()
+    rag.add_documents([
+        Document(page_content=f"Ticket: PAY-{i} | Title: Retry handling for gateway {i}", metadata={"source": "jira", "id": f"PAY-{i}"})
+        for i in range(20)
+    ])
+    embeddings = rag._get_embeddings()
+    counting = CountingEmbeddings(embeddings.embeddings, delay=0.02)
+    embeddings.embeddings = counting
+
+    snippets = [f"def handler_{i}(event):\n    return gateway_{i}.charge(event)" for i in range(REQUESTS)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*[rag.get_context_cards(s) for s in snippets])
+    ms = (time.perf_counter() - start) * 1000
+
+    stats = rag.get_metrics()["embedding_batcher"]
+    print(f"{REQUESTS} distinct retrievals in {ms:.0f}ms -> {counting.calls} embedding calls {counting.sizes}")
+    print(f"batcher: {stats}")
+    assert all(results)
+    assert counting.calls <= REQUESTS // 16 + 1
+    assert max(counting.sizes) <= 16
+
+    # Cached queries skip the batcher entirely
+    calls = counting.calls
+    await asyncio.gather(*[rag.get_context_cards(s) for s in snippets[:5]])
+    assert counting.calls == calls
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    print("\nSUCCESS: concurrent query embeddings were micro-batched.")
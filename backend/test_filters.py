@@ -0,0 +1,93 @@
+
+from testing_env import use_temp_stores
+
+# Buries a few Jira tickets under Slack chatter and checks that request filters
+# are pushed into the vector search: filtered retrieval and stats only see the
+# matching subset. In-process, fake models, temp stores.
+
+use_temp_stores("contextsync_filters_")
+
+from fastapi.testclient import TestClient
+from app import main
+from app.services.data_processing import epoch_seconds, process_slack_data, process_jira_data
+
+SNIPPET = "def process_payment(self, amount, card_token):\n    return self.gateway.charge(amount, card_token)"
+DAY = 86400
+T0 = 1700000000.0
+
+def seed(rag):
+    chatter = [
+        {"ts": f"{T0 + i * DAY:.6f}", "user": "dave" if i % 2 else "erin", "text": f"`process_payment` flaked again on build {i}"}
+        for i in range(40)
+    ]
+    tickets = [
+        {"key": f"PAY-{n}", "summary": f"process_payment issue {n}", "description": f"Gateway charge fails, case {n}",
+         "status": status, "creator": "alice", "updated": "2023-11-20T10:00:00.000+0000"}
+        for n, status in enumerate(["In Progress", "To Do", "Done"])
+    ]
+    rag.add_documents(process_slack_data(chatter, "C-PAY") + process_jira_data(tickets))
+
+def test_epoch_seconds():
+    assert epoch_seconds("1700000000.000100") == 1700000000.0001
+    assert epoch_seconds("2023-11-14T22:13:20.000+0000") == T0
+    assert epoch_seconds("2023-11-14T22:13:20.000Z") == T0
+    assert epoch_seconds("N/A") is None and epoch_seconds(None) is None
+
+def retrieve(client, filters=None):
+    payload = {"code_snippet": SNIPPET, "file_path": "p.py", "line_numbers": "1-2", "filters": filters}
+    response = client.post("/context/retrieve", json=payload)
+    assert response.status_code == 200
+    return response.json()
+
+def check_retrieve(client):
+    unfiltered = retrieve(client)
+    jira = retrieve(client, {"sources": ["jira"]})
+    print(f"unfiltered top k: {sum(c['source'] == 'jira' for c in unfiltered)} jira of {len(unfiltered)}; "
+          f"sources=[jira]: {len(jira)} hits")
+    assert len(jira) == 3 and all(c["source"] == "jira" for c in jira)
+
+    open_only = retrieve(client, {"open_only": True})
+    assert sorted(c["title"] for c in open_only) == ["process_payment issue 0", "process_payment issue 1"]
+    # open_only narrows the other filters instead of replacing them
+    assert retrieve(client, {"open_only": True, "sources": ["slack"]}) == []
+    assert len(retrieve(client, {"open_only": True, "sources": ["jira", "slack"]})) == 2
+
+    dave = retrieve(client, {"author": "dave"})
+    assert dave and all(c["title"] == "dave" for c in dave)
+
+    window = retrieve(client, {"sources": ["slack"], "since": T0 + 10 * DAY, "until": T0 + 12 * DAY})
+    details = client.get("/context/chunks", params={"ids": ",".join(c["id"] for c in window)}).json()
+    print(f"3-day window: {len(window)} messages")
+    assert len(window) == 3 and all("build 1" in d["content"] for d in details)
+
+    assert retrieve(client, {"channel": "C-OTHER"}) == []
+
+def check_stats(client):
+    payload = {"snippets": [SNIPPET], "symbols": ["process_payment"]}
+    unfiltered = client.post("/context/stats", json=payload).json()[0]
+    open_jira = client.post("/context/stats", json={**payload, "filters": {"open_only": True}}).json()[0]
+    print(f"stats: unfiltered {unfiltered}, open_only {open_jira}")
+    assert open_jira == {"slack_count": 0, "jira_count": 2, "open_jira_count": 2}
+
+    # A ticket split over several chunks is one ticket, as in the mention index
+    description = " ".join(f"process_payment double charges on retry step {i} of the gateway flow." for i in range(40))
+    long_ticket = {"key": "PAY-9", "summary": "process_payment double charge", "description": description,
+                   "status": "To Do", "creator": "alice", "updated": "2023-11-20T10:00:00.000+0000"}
+    chunks = main.rag_service.add_documents(process_jira_data([long_ticket]))["new"]
+    open_jira = client.post("/context/stats", json={**payload, "filters": {"open_only": True}}).json()[0]
+    print(f"stats after a {chunks}-chunk ticket: open_only {open_jira}")
+    assert open_jira == {"slack_count": 0, "jira_count": 3, "open_jira_count": 3}
+
+def check_explain(client):
+    payload = {"code_snippet": SNIPPET, "file_path": "p.py", "line_numbers": "1-2", "filters": {"sources": ["jira"]}}
+    response = client.post("/explain", json=payload)
+    assert response.status_code == 200 and response.json()["markdown"]
+
+if __name__ == "__main__":
+    test_epoch_seconds()
+    with TestClient(main.app) as client:
+        seed(main.rag_service)
+        check_retrieve(client)
+        check_stats(client)
+        check_explain(client)
+    print("\nSUCCESS: filters are applied inside retrieval and stats.")
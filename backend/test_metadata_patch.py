@@ -0,0 +1,59 @@
+import asyncio
+
+from testing_env import use_temp_stores, CountingEmbeddings
+
+# Re-ingests documents whose text is unchanged but whose metadata moved on
+# (Jira status, Confluence version) and checks the new values reach the store
+# without any embedding calls. In-process, fake models, temp stores.
+
+use_temp_stores("contextsync_patch_")
+
+from app.services.rag import RAGService
+from app.services.data_processing import process_jira_data, process_confluence_data
+
+SNIPPET = "def refund(self, payment_id):\n    return self.gateway.refund(payment_id)"
+
+def tickets(status):
+    # Long enough to split into several chunks, all of which must be patched
+    description = " ".join(f"Refunds for gateway V2 payments fail on step {i} of the settlement batch." for i in range(40))
+    return [{"key": "PAY-7", "summary": "Refunds fail on V2", "description": description, "status": status, "creator": "mock"}]
+
+def pages(version):
+    return [{"id": "9001", "title": "Refund runbook", "url": "", "version": version,
+             "body": "<p>Retry refunds after the settlement window closes.</p>", "last_modified": "2024-01-01"}]
+
+async def main():
+    rag = RAGService()
+    embeddings = rag._get_embeddings()
+    counter = CountingEmbeddings(embeddings.embeddings)
+    embeddings.embeddings = counter
+
+    first = rag.add_documents(process_jira_data(tickets("In Progress")) + process_confluence_data(pages(3)))
+    chunks = first["new"]
+    assert chunks > 2, "expected the ticket to span several chunks"
+    before = (await rag.get_context_stats_batch([SNIPPET]))[0]
+    print(f"seeded {chunks} chunks, open tickets: {before['open_jira_count']}")
+    assert before["open_jira_count"] >= 1
+
+    calls = counter.calls
+    second = rag.add_documents(process_jira_data(tickets("Done")) + process_confluence_data(pages(4)))
+    print(f"re-ingest: {second}, embedding calls: {counter.calls - calls}")
+    assert second["new"] == 0 and second["patched"] == chunks
+    assert counter.calls == calls, "unchanged text must not be re-embedded"
+
+    stored = rag.db.get(where={"source": "jira"}, include=["metadatas"])["metadatas"]
+    assert {meta["status"] for meta in stored} == {"Done"}
+    assert rag.db.get(where={"source": "confluence"}, include=["metadatas"])["metadatas"][0]["version"] == 4
+
+    # Cached stats for the snippet are recomputed, not served stale
+    after = (await rag.get_context_stats_batch([SNIPPET]))[0]
+    print(f"open tickets after the transition: {after['open_jira_count']}")
+    assert after["open_jira_count"] == 0
+
+    third = rag.add_documents(process_jira_data(tickets("Done")))
+    print(f"identical re-ingest: {third}")
+    assert third["patched"] == 0 and third["unchanged"] > 0
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    print("\nSUCCESS: metadata changes are patched in place without re-embedding.")
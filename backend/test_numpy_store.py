@@ -0,0 +1,147 @@
+import os
+import tempfile
+import threading
+import numpy as np
+import chromadb
+
+from app.services.numpy_store import NumpyVectorStore
+from testing_env import use_temp_stores, STORES
+
+# Checks the NumPy store against Chroma on the same rows: same neighbours and
+# distances, same where-clause results, and that rows, deletes and metadata
+# updates survive reopening the memory-mapped files. No models needed.
+
+N = 2000
+DIM = 64
+
+def make_rows(rng):
+    vectors = rng.standard_normal((N, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{i}" for i in range(N)]
+    metadatas = [
+        {"source": ["slack", "jira", "confluence"][i % 3], "status": "Done" if i % 4 == 0 else "Open", "updated_at": float(i)}
+        for i in range(N)
+    ]
+    return ids, vectors, [f"text {i}" for i in range(N)], metadatas
+
+WHERES = [
+    None,
+    {"source": "jira"},
+    {"$and": [{"source": {"$in": ["jira", "slack"]}}, {"status": {"$nin": ["Done"]}}]},
+    {"$or": [{"source": "confluence"}, {"updated_at": {"$gte": 1500.0}}]},
+    {"$and": [{"updated_at": {"$gt": 100.0}}, {"updated_at": {"$lte": 200.0}}]},
+]
+
+def check_matches_chroma(store, collection, queries):
+    for where in WHERES:
+        expected = collection.query(query_embeddings=queries, n_results=10, where=where, include=["distances"])
+        actual = store.query(query_embeddings=queries, n_results=10, where=where, include=["distances"])
+        for exp_ids, act_ids, exp_d, act_d in zip(expected["ids"], actual["ids"], expected["distances"], actual["distances"]):
+            # HNSW is approximate, so allow the odd miss at the tail
+            assert len(set(exp_ids) & set(act_ids)) >= 9, (where, exp_ids, act_ids)
+            # The NumPy scan is exact, so its nearest hit is never further than Chroma's
+            assert act_d[0] <= exp_d[0] + 1e-4, (where, exp_d[0], act_d[0])
+        got = store.get(where=where, include=[])["ids"] if where else None
+        if where:
+            assert sorted(got) == sorted(collection.get(where=where, include=[])["ids"]), where
+    print(f"{len(WHERES)} where clauses: same neighbours and rows as Chroma")
+
+def check_persistence(path, ids, vectors, queries):
+    store = NumpyVectorStore(path)
+    store.delete(ids[:100])
+    store.update(ids=["chunk-500"], metadatas=[{"summary": "patched"}])
+    before = store.query(query_embeddings=queries, n_results=5, include=["distances"])
+    del store
+
+    reopened = NumpyVectorStore(path)
+    assert reopened.count() == N - 100
+    meta = reopened.get(ids=["chunk-500"], include=["metadatas"])["metadatas"][0]
+    assert meta["summary"] == "patched" and meta["source"] == "confluence"
+    assert reopened.query(query_embeddings=queries, n_results=5, include=["distances"])["ids"] == before["ids"]
+
+    # Freed rows are reused before the matrix grows
+    capacity = reopened.get_stats()["capacity"]
+    reopened.add(ids=[f"new-{i}" for i in range(100)], embeddings=vectors[:100], documents=["new"] * 100)
+    stats = reopened.get_stats()
+    print(f"after reopen: {stats}")
+    assert stats["capacity"] == capacity and stats["free_rows"] == 0 and stats["chunks"] == N
+    hit = reopened.query(query_embeddings=vectors[:1], n_results=1, include=["documents", "distances"])
+    assert hit["ids"][0] == ["new-0"] and hit["documents"][0] == ["new"]
+
+def check_concurrent_writes(path, vectors):
+    # Searches racing deletes and row reuse must never return a freed row or a stale distance
+    store = NumpyVectorStore(path)
+    errors = []
+    stop = threading.Event()
+
+    def churn():
+        for round in range(30):
+            batch = [f"churn-{round}-{i}" for i in range(50)]
+            store.add(ids=batch, embeddings=vectors[:50], documents=["churn"] * 50, metadatas=[{"source": "jira"}] * 50)
+            store.delete(batch)
+        stop.set()
+
+    def search():
+        while not stop.is_set():
+            try:
+                hits = store.query(query_embeddings=vectors[:3], n_results=5, include=["metadatas", "distances"])
+                for query, chunk_ids, distances in zip(vectors[:3], hits["ids"], hits["distances"]):
+                    found = store.get(ids=chunk_ids, include=["embeddings"])
+                    assert None not in chunk_ids
+                    for chunk_id, embedding in zip(found["ids"], found["embeddings"]):
+                        expected = float(np.sum((embedding - query) ** 2))
+                        assert abs(distances[chunk_ids.index(chunk_id)] - expected) < 1e-3, (chunk_id, expected)
+            except Exception as e:
+                errors.append(repr(e))
+
+    threads = [threading.Thread(target=churn)] + [threading.Thread(target=search) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"concurrent queries during 30 add/delete rounds: {len(errors)} errors")
+    assert not errors, errors[:3]
+
+def check_import_from_chroma():
+    # Switching an existing deployment to VECTOR_BACKEND=numpy copies the Chroma collection over once
+    tmp = use_temp_stores("contextsync_numpy_import_")
+    from app.services.rag import RAGService
+    from app.services.data_processing import process_slack_data
+
+    def service(backend, stores):
+        # Both backends share the vector store paths but keep their own side stores
+        os.environ["VECTOR_BACKEND"] = backend
+        for name in STORES:
+            os.environ[f"{name}_PATH"] = f"{tmp}/{stores}_{name.lower()}.db"
+        return RAGService()
+
+    chroma = service("chroma", "chroma")
+    messages = [{"ts": f"{1700000000 + i}.000000", "user": "dave", "text": f"deploy step {i} failed"} for i in range(30)]
+    chroma.add_documents(process_slack_data(messages, "C-OPS"))
+    expected = chroma.retrieve_scored("deploy step failed", k=10)
+
+    imported = service("numpy", "numpy")
+    assert imported.db.count() == chroma.db._collection.count() == 30
+    actual = imported.retrieve_scored("deploy step failed", k=10)
+    print(f"imported {imported.db.count()} chunks from Chroma; top 10 ids match: {[d.id for d, _ in expected] == [d.id for d, _ in actual]}")
+    assert [d.id for d, _ in expected] == [d.id for d, _ in actual]
+    # Already populated, so a restart doesn't import again
+    assert service("numpy", "numpy").db.count() == 30
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(7)
+    ids, vectors, texts, metadatas = make_rows(rng)
+    queries = rng.standard_normal((5, DIM)).astype(np.float32)
+    tmp = tempfile.mkdtemp(prefix="contextsync_numpy_")
+
+    collection = chromadb.PersistentClient(path=f"{tmp}/chroma").get_or_create_collection("rows")
+    collection.add(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+    store = NumpyVectorStore(f"{tmp}/numpy")
+    store.add(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+    check_matches_chroma(store, collection, queries)
+    del store
+    check_persistence(f"{tmp}/numpy", ids, vectors, queries)
+    check_concurrent_writes(f"{tmp}/numpy", vectors)
+    check_import_from_chroma()
+    print("\nSUCCESS: the NumPy store matches Chroma and persists across reopening.")
@@ -0,0 +1,63 @@
+import time
+import asyncio
+
+from testing_env import use_temp_stores, CountingEmbeddings
+
+# Fires bursts of identical concurrent requests at RAGService (fake models, temp
+# stores) and checks each burst costs a single upstream embedding/search/LLM call.
+
+use_temp_stores("contextsync_flight_", RELEVANCE_SCORE_GAP="0", FAKE_LLM_TOKEN_DELAY="0.01")
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from app.services.rag import RAGService
+
+BURST = 20
+SNIPPET = """
+    def process_payment(self, amount: float, card_token: str) -> bool:
+        result = self.gateway.charge(amount, card_token)
+"""
+
+class CountingLLM(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+
+    def on_chat_model_start(self, *args, **kwargs):
+        self.calls += 1
+
+async def burst(make_call):
+    start = time.perf_counter()
+    results = await asyncio.gather(*[make_call() for _ in range(BURST)])
+    return results, (time.perf_counter() - start) * 1000
+
+async def main():
+    rag = RAGService()
+    rag.add_documents([
+        Document(page_content="Gateway V2 throws 503s, added retry loop to `process_payment`.", metadata={"source": "slack", "ts": "1", "user": "dave"}),
+        Document(page_content="Ticket: PAY-1024 | Title: Idempotency keys for payment retries", metadata={"source": "jira", "id": "PAY-1024", "status": "In Progress"}),
+    ])
+
+    embeddings = rag._get_embeddings()
+    counting = CountingEmbeddings(embeddings.embeddings, delay=0.05)
+    embeddings.embeddings = counting
+    llm = CountingLLM()
+    rag.llm.callbacks = [llm]
+
+    results, ms = await burst(lambda: rag.get_context_cards(SNIPPET))
+    print(f"retrieve x{BURST}: {ms:.0f}ms, embed calls={counting.calls}, {rag._flights['retrieve'].get_stats()}")
+    assert counting.calls == 1
+    assert all(len(r) == len(results[0]) for r in results)
+
+    results, ms = await burst(lambda: rag.get_context_stats_batch([SNIPPET + "\n# stats"]))
+    print(f"stats x{BURST}: {ms:.0f}ms, embed calls={counting.calls - 1}, {rag._flights['stats'].get_stats()}")
+    assert counting.calls == 2
+    assert all(r == results[0] for r in results)
+
+    results, ms = await burst(lambda: rag.explain_code(SNIPPET, "demo/payment_processor.py", "19-33"))
+    print(f"explain x{BURST}: {ms:.0f}ms, LLM calls={llm.calls}, {rag._flights['explain'].get_stats()}")
+    assert llm.calls == 1
+    assert len({r.markdown for r in results}) == 1
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    print("\nSUCCESS: each burst of identical requests made one upstream call.")
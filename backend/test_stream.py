@@ -0,0 +1,89 @@
+import os
+import json
+
+from testing_env import use_temp_stores
+
+# Checks the SSE framing of /explain/stream and /chat/stream in-process, with
+# the local fake embeddings and LLM, so no API keys or running server are needed.
+
+use_temp_stores("contextsync_stream_", RELEVANCE_SCORE_GAP="0", FAKE_LLM_TOKEN_DELAY="0.02")
+
+from fastapi.testclient import TestClient
+from app import main
+from app.services.data_processing import process_slack_data, process_jira_data
+
+CODE_SNIPPET = """
+    def process_payment(self, amount: float, card_token: str) -> bool:
+        result = self.gateway.charge(amount, card_token)
+"""
+
+def read_events(response):
+    """Parses an event-stream body into (event, data) pairs."""
+    events = []
+    event = None
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: "):])))
+            event = None
+    return events
+
+def seed(rag):
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    with open(os.path.join(data_dir, "mock_slack.json")) as f:
+        slack = [{"ts": str(i), "user": m["user"], "text": m["message"]} for i, m in enumerate(json.load(f))]
+    with open(os.path.join(data_dir, "mock_jira.json")) as f:
+        jira = [{
+            "key": t["id"], "summary": t["title"], "description": t["description"],
+            "status": t["status"], "creator": "mock", "url": ""
+        } for t in json.load(f)]
+    rag.add_documents(process_slack_data(slack, "C-MOCK") + process_jira_data(jira))
+
+def check_explain_stream(client):
+    payload = {"code_snippet": CODE_SNIPPET, "file_path": "demo/payment_processor.py", "line_numbers": "19-33"}
+    with client.stream("POST", "/explain/stream", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = read_events(response)
+
+    names = [name for name, _ in events]
+    print(f"/explain/stream events: context x{names.count('context')}, token x{names.count('token')}, done x{names.count('done')}")
+    assert names[0] == "context" and names[-1] == "done"
+    assert names.count("token") > 1, "expected the answer to arrive as several tokens"
+    assert events[0][1]["cards"], "expected retrieved context cards before generation"
+    done = events[-1][1]
+    print(f"  retrieval={events[0][1]['retrieval_ms']}ms first_token={done['first_token_ms']}ms total={done['total_ms']}ms")
+    assert done["first_token_ms"] < done["total_ms"]
+
+    with client.stream("POST", "/explain/stream", json=payload) as response:
+        events = read_events(response)
+    print(f"  repeat: cached={events[-1][1]['cached']} tokens={[n for n, _ in events].count('token')}")
+    assert events[-1][1]["cached"] is True
+
+def check_chat_stream(client):
+    payload = {"message": "What does process_payment retry on?", "history": [{"role": "user", "content": "hi {there}"}]}
+    with client.stream("POST", "/chat/stream", json=payload) as response:
+        assert response.status_code == 200
+        events = read_events(response)
+
+    reply = "".join(data["text"] for name, data in events if name == "token")
+    done = events[-1][1]
+    print(f"/chat/stream: {len(events) - 1} tokens, first_token={done['first_token_ms']}ms total={done['total_ms']}ms")
+    assert events[-1][0] == "done"
+    assert reply == main.rag_service.llm.responses[0]
+
+def check_stats_fake_mode(client):
+    # Batched query embeddings pass a Gemini task_type, which the fake embeddings don't take
+    snippets = [CODE_SNIPPET, CODE_SNIPPET.replace("process_payment", "refund_payment")]
+    response = client.post("/context/stats", json={"snippets": snippets})
+    print(f"/context/stats with fake models: {response.status_code} {response.json()}")
+    assert response.status_code == 200 and len(response.json()) == 2
+
+if __name__ == "__main__":
+    with TestClient(main.app) as client:
+        seed(main.rag_service)
+        check_explain_stream(client)
+        check_chat_stream(client)
+        check_stats_fake_mode(client)
+    print("\nSUCCESS: SSE streams framed as expected.")
@@ -0,0 +1,46 @@
+import os
+import time
+import tempfile
+
+# Shared setup for the in-process test scripts. Import and call use_temp_stores()
+# before importing anything from app, since the services read their paths and
+# model settings from the environment when they are created.
+
+STORES = ["EMBEDDING_CACHE", "LEXICAL_INDEX", "MENTION_INDEX", "EXPLAIN_CACHE", "SUMMARY_STORE", "DOCUMENT_REGISTRY", "NOTION_CACHE"]
+
+def use_temp_stores(prefix: str, **env) -> str:
+    """Points every store at a fresh temp dir and switches to the fake models. Returns the dir."""
+    tmp = tempfile.mkdtemp(prefix=prefix)
+    os.environ["CONTEXTSYNC_FAKE_MODELS"] = "1"
+    # Fake embeddings carry no meaning, so keep every hit instead of cutting on relevance
+    os.environ["RELEVANCE_THRESHOLD"] = "-inf"
+    os.environ["CHROMA_DB_PATH"] = os.path.join(tmp, "chroma_db")
+    os.environ["NUMPY_STORE_PATH"] = os.path.join(tmp, "numpy_store")
+    for name in STORES:
+        os.environ[f"{name}_PATH"] = os.path.join(tmp, f"{name.lower()}.db")
+    os.environ["SYNC_STATE_PATH"] = os.path.join(tmp, "sync_state.json")
+    os.environ.update({key: str(value) for key, value in env.items()})
+    return tmp
+
+class CountingEmbeddings:
+    """Records every call to the underlying embedding model, optionally slowed so concurrent callers overlap."""
+
+    def __init__(self, inner, delay: float = 0.0):
+        self.inner = inner
+        self.delay = delay
+        self.calls = 0
+        self.sizes = []
+
+    def _record(self, size: int):
+        self.calls += 1
+        self.sizes.append(size)
+        if self.delay:
+            time.sleep(self.delay)
+
+    def embed_query(self, text):
+        self._record(1)
+        return self.inner.embed_query(text)
+
+    def embed_documents(self, texts):
+        self._record(len(texts))
+        return self.inner.embed_documents(texts)
@@ -70,8 +70,11 @@ export class ContextCodeLensProvider implements vscode.CodeLensProvider {
             });
             this.outputChannel.appendLine(`ContextSync CodeLens: Extracted ${snippets.length} snippets.`);
 
+            // Symbol names let the backend answer from its mention index instead of running a vector search
+            const symbolNames = functions.map(f => f.name);
+
             // Call Backend
-            const stats = await this.fetchStats(apiBaseUrl, snippets);
+            const stats = await this.fetchStats(apiBaseUrl, snippets, symbolNames);
             this.outputChannel.appendLine(`ContextSync CodeLens: Fetched stats for ${stats.length} items.`);
 
             const codeLenses: vscode.CodeLens[] = [];
@@ -142,9 +145,9 @@ export class ContextCodeLensProvider implements vscode.CodeLensProvider {
         return result;
     }
 
-    private fetchStats(baseUrl: string, snippets: string[]): Promise<StatsObject[]> {
+    private fetchStats(baseUrl: string, snippets: string[], symbols: string[]): Promise<StatsObject[]> {
         return new Promise((resolve, reject) => {
-            const data = JSON.stringify({ snippets });
+            const data = JSON.stringify({ snippets, symbols });
             const urlObj = new URL('/context/stats', baseUrl);
             const requestModule = urlObj.protocol === 'https:' ? https : http;
 
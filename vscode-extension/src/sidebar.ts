@@ -5,6 +5,8 @@ import * as https from 'https';
 export class ContextSidebarProvider implements vscode.WebviewViewProvider {
     public static readonly viewType = 'contextSyncView';
     private _view?: vscode.WebviewView;
+    // Full card bodies by chunk ID, revalidated with their ETag
+    private _chunkCache = new Map<string, { etag: string, text: string }>();
 
     constructor(
         private readonly _extensionUri: vscode.Uri,
@@ -33,6 +35,8 @@ export class ContextSidebarProvider implements vscode.WebviewViewProvider {
                 vscode.window.showInformationMessage('Copied to clipboard!');
             } else if (message.command === 'chat') {
                 this.handleChat(message.text, message.history, message.context);
+            } else if (message.command === 'loadChunk') {
+                this.fetchChunkDetail(message.id);
             }
         });
     }
@@ -234,6 +238,71 @@ export class ContextSidebarProvider implements vscode.WebviewViewProvider {
         req.end();
     }
 
+    public fetchChunkDetail(id: string) {
+        const config = vscode.workspace.getConfiguration('contextsync');
+        const apiBaseUrl = config.get<string>('apiBaseUrl') || 'http://127.0.0.1:8000';
+        let hostname = '127.0.0.1';
+        let port = 8000;
+        let protocol = 'http:';
+        try {
+            const url = new URL(apiBaseUrl);
+            hostname = url.hostname;
+            port = parseInt(url.port) || (url.protocol === 'https:' ? 443 : 80);
+            protocol = url.protocol;
+        } catch (e) { }
+
+        const cached = this._chunkCache.get(id);
+        const headers: { [key: string]: string } = {};
+        if (cached) {
+            headers['If-None-Match'] = cached.etag;
+        }
+
+        const options = {
+            hostname: hostname,
+            port: port,
+            path: `/context/chunks?scope=document&ids=${encodeURIComponent(id)}`,
+            method: 'GET',
+            headers: headers
+        };
+
+        const postDetail = (text: string) => {
+            this._view?.webview.postMessage({ command: 'chunkDetail', id: id, text: text });
+        };
+
+        const requestModule = protocol === 'https:' ? https : http;
+        const req = requestModule.request(options, (res) => {
+            let data = '';
+            res.on('data', (chunk) => { data += chunk; });
+            res.on('end', () => {
+                if (res.statusCode === 304 && cached) {
+                    postDetail(cached.text);
+                } else if (res.statusCode === 200) {
+                    try {
+                        const details = JSON.parse(data);
+                        const detail = details[0];
+                        const text = detail
+                            ? (detail.summary ? `Summary: ${detail.summary}\n\n` : '') + detail.content
+                            : 'This item is no longer in the context store.';
+                        const etag = res.headers['etag'];
+                        if (typeof etag === 'string') {
+                            this._chunkCache.set(id, { etag: etag, text: text });
+                        }
+                        postDetail(text);
+                    } catch (e) {
+                        postDetail('Failed to parse context details.');
+                    }
+                } else {
+                    postDetail(`Error: Server returned ${res.statusCode}`);
+                }
+            });
+        });
+
+        req.on('error', (e) => {
+            postDetail('Context Engine Disconnected. Is the Python server running?');
+        });
+        req.end();
+    }
+
     public triggerSync() {
         const config = vscode.workspace.getConfiguration('contextsync');
         const apiBaseUrl = config.get<string>('apiBaseUrl') || 'http://127.0.0.1:8000';
@@ -309,16 +378,18 @@ export class ContextSidebarProvider implements vscode.WebviewViewProvider {
                 else if (source === 'CONFLUENCE') icon = '📘';
                 else if (source === 'NOTION') icon = '📓';
 
+                // Cards carry a one-line preview; the full body is fetched when a card is first expanded
                 const cardsHtml = items.map(obj => `
-                    <div class="context-card ${sourceClass}">
+                    <div class="context-card ${sourceClass}" data-id="${this.escapeHtml(obj.id)}">
                         <div class="card-header" onclick="toggleCard(this)">
                             <span class="arrow codicon codicon-chevron-right"></span>
                             <div class="header-content">
-                                <span class="context-user">${obj.title_or_user}</span>
+                                <span class="context-user">${this.escapeHtml(obj.title)}</span>
+                                <span class="context-preview">${this.escapeHtml(obj.preview)}</span>
                             </div>
                         </div>
                         <div class="card-body">
-                            <div class="context-summary">${this.escapeHtml(obj.content_summary)}</div>
+                            <div class="context-summary">Loading...</div>
                             ${obj.url ? `<vscode-link href="${obj.url}">Open in ${obj.source}</vscode-link>` : ''}
                         </div>
                     </div>
@@ -527,6 +598,10 @@ export class ContextSidebarProvider implements vscode.WebviewViewProvider {
                     if (card.classList.contains('expanded')) {
                         arrow.classList.remove('codicon-chevron-right');
                         arrow.classList.add('codicon-chevron-down');
+                        if (card.dataset.id && !card.dataset.requested) {
+                            card.dataset.requested = 'true';
+                            vscode.postMessage({ command: 'loadChunk', id: card.dataset.id });
+                        }
                     } else {
                         arrow.classList.remove('codicon-chevron-down');
                         arrow.classList.add('codicon-chevron-right');
@@ -659,7 +734,11 @@ export class ContextSidebarProvider implements vscode.WebviewViewProvider {
 
                 window.addEventListener('message', event => {
                     const message = event.data;
-                    if (message.command === 'chatResponse') {
+                    if (message.command === 'chunkDetail') {
+                        const card = document.querySelector('.context-card[data-id="' + message.id + '"]');
+                        const body = card ? card.querySelector('.context-summary') : null;
+                        if (body) body.textContent = message.text;
+                    } else if (message.command === 'chatResponse') {
                         appendMessage('assistant', message.text);
                         if (chatInput) {
                             chatInput.disabled = false;
@@ -750,7 +829,8 @@ export class ContextSidebarProvider implements vscode.WebviewViewProvider {
                 .card-body { display: none; padding: 8px 0; font-size: 0.9em; }
                 .context-card.expanded .card-body { display: block; }
                 .context-user { opacity: 0.85; font-size: 0.9em; }
-                .context-summary { margin-bottom: 6px; line-height: 1.4; opacity: 0.9; }
+                .context-summary { margin-bottom: 6px; line-height: 1.4; opacity: 0.9; white-space: pre-wrap; }
+                .context-preview { display: block; font-size: 0.85em; opacity: 0.7; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }
                 .full-width-btn { width: 100%; margin-top: 10px; }
 
                 .chat-message { margin-bottom: 12px; padding: 8px 12px; border-radius: 6px; max-width: 85%; line-height: 1.5; overflow-wrap: anywhere; word-break: break-word; }